@@ -3,10 +3,11 @@ from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from .database import create_db_and_tables, engine
 from sqlmodel import Session, select, text
-from .models import ProviderConfig, VoiceConfig
+from .models import ProviderConfig, VoiceConfig, VOICE_CONFIG_ID
 from .utils.security import encrypt_value
 import os
 import uuid
+import asyncio
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -290,6 +291,7 @@ async def lifespan(app: FastAPI):
         if not v_config:
             if debug_mode: print("[DEBUG] Creating default VoiceConfig.")
             v_config = VoiceConfig(
+                id=VOICE_CONFIG_ID,
                 webhook_secret=uuid.uuid4().hex,
                 stt_url=stt_url_def,
                 tts_url=tts_url_def,
@@ -473,8 +475,19 @@ async def lifespan(app: FastAPI):
             print(f"[DEBUG] Final Active Config -> LLM URL: {v_config.llm_url} (Model: {v_config.llm_model})")
             print(f"[DEBUG] Final Active Config -> System Prompt Preview: {v_config.system_prompt[:50] if v_config.system_prompt else 'None'}...")
 
+    # Warm the shared STT/TTS/LLM connection pools in the background (doesn't delay startup)
+    warmup_task = asyncio.create_task(voice_api.warm_up_connections())
+
     yield
 
+    warmup_task.cancel()
+
+    # Shutdown: release pooled HTTP connections
+    await voice_api.LLM_HTTP_CLIENT.aclose()
+    await parakeet.HTTP_CLIENT.aclose()
+    await chatterbox.HTTP_CLIENT.aclose()
+    await telnyx_provider.HTTP_CLIENT.aclose()
+
 app = FastAPI(lifespan=lifespan)
 
 @app.get("/api/health")
@@ -482,6 +495,8 @@ def health_check():
     return {"status": "ok"}
 
 from .routers import api, voice_api
+from .utils import parakeet, chatterbox
+from .providers import telnyx as telnyx_provider
 app.include_router(api.router, prefix="/api")
 app.include_router(voice_api.router, prefix="/api")
 
@@ -22,6 +22,9 @@ class ProviderConfig(SQLModel, table=True):
     assigned_user_id: Optional[str] = Field(default=None, description="Open WebUI User ID to route calls/messages to")
     assigned_user_label: Optional[str] = Field(default=None, description="Human readable label for the assigned user")
 
+# VoiceConfig is a singleton row; it is seeded with this primary key so lookups can use session.get()
+VOICE_CONFIG_ID = 1
+
 class VoiceConfig(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     stt_url: str = Field(default="http://parakeet:8000")
@@ -4,8 +4,12 @@ import requests
 import json
 import base64
 import os
+import httpx
 from .base import SMSProvider
 
+# Shared async client for Call Control requests made from async handlers (keep-alive + HTTP/2, no TLS handshake per call)
+HTTP_CLIENT = httpx.AsyncClient(http2=True, timeout=10, limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+
 class TelnyxProvider(SMSProvider):
     def __init__(self, api_key: str):
         super().__init__(api_key)
@@ -183,48 +187,66 @@ class TelnyxProvider(SMSProvider):
         except:
             return 0.0
 
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    @staticmethod
+    def _dial_payload(to_number: str, from_number: str, connection_id: str, stream_url: str = None, stream_track: str = "both_tracks", codec: str = "PCMU") -> dict:
+        # clean numbers
+        payload = {
+            "connection_id": connection_id,
+            "to": to_number.strip(),
+            "from": from_number.strip(),
+        }
+        if stream_url:
+            payload["stream_url"] = stream_url
+            payload["stream_track"] = stream_track
+            payload["stream_bidirectional_mode"] = "rtp"
+            # Signal the codec to Telnyx!
+            # Note: Telnyx uses "L16" but might want "L16" strictly. Codec config is usually PCMU/PCMA/L16.
+            payload["stream_bidirectional_codec"] = codec
+        return payload
+
+    @staticmethod
+    def _dial_result(status_code: int, text: str, body) -> dict:
+        print(f"[DEBUG] Direct API response: {status_code} {text}")
+        if status_code >= 400:
+            return {"success": False, "error": text}
+
+        data = body().get('data', {})
+        call_control_id = data.get('call_control_id')
+            
+        return {
+            "success": True, 
+            "call_id": call_control_id,
+            "full_response": str(data)
+        }
+
     def make_call(self, to_number: str, from_number: str, connection_id: str, stream_url: str = None, stream_track: str = "both_tracks", codec: str = "PCMU") -> dict:
         try:
-            import requests
-            import json
-            # clean numbers
-            to_number = to_number.strip()
-            from_number = from_number.strip()
-            
-            payload = {
-                "connection_id": connection_id,
-                "to": to_number,
-                "from": from_number,
-            }
-            if stream_url:
-                payload["stream_url"] = stream_url
-                payload["stream_track"] = stream_track
-                payload["stream_bidirectional_mode"] = "rtp"
-                # Signal the codec to Telnyx!
-                # Note: Telnyx uses "L16" but might want "L16" strictly. Codec config is usually PCMU/PCMA/L16.
-                payload["stream_bidirectional_codec"] = codec
-
+            payload = self._dial_payload(to_number, from_number, connection_id, stream_url, stream_track, codec)
             print(f"[DEBUG] Direct API Dial Payload: {json.dumps(payload, indent=2)}")
 
             # Use Direct REST API to rule out SDK issues
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            resp = requests.post("https://api.telnyx.com/v2/calls", headers=headers, json=payload)
-            print(f"[DEBUG] Direct API response: {resp.status_code} {resp.text}")
-            
-            if resp.status_code >= 400:
-                return {"success": False, "error": resp.text}
+            resp = requests.post("https://api.telnyx.com/v2/calls", headers=self._headers(), json=payload)
+            return self._dial_result(resp.status_code, resp.text, resp.json)
+        except Exception as e:
+            print(f"Telnyx Dial Error: {e}")
+            return {"success": False, "error": str(e)}
 
-            data = resp.json().get('data', {})
-            call_control_id = data.get('call_control_id')
-                
-            return {
-                "success": True, 
-                "call_id": call_control_id,
-                "full_response": str(data)
-            }
+    async def make_call_async(self, to_number: str, from_number: str, connection_id: str, stream_url: str = None, stream_track: str = "both_tracks", codec: str = "PCMU") -> dict:
+        """
+        Same as make_call(), on the shared async client so the event loop isn't blocked for the Telnyx round trip.
+        """
+        try:
+            payload = self._dial_payload(to_number, from_number, connection_id, stream_url, stream_track, codec)
+            print(f"[DEBUG] Direct API Dial Payload: {json.dumps(payload, indent=2)}")
+
+            resp = await HTTP_CLIENT.post("https://api.telnyx.com/v2/calls", headers=self._headers(), json=payload)
+            return self._dial_result(resp.status_code, resp.text, resp.json)
         except Exception as e:
             print(f"Telnyx Dial Error: {e}")
             return {"success": False, "error": str(e)}
@@ -375,6 +397,40 @@ class TelnyxProvider(SMSProvider):
         except Exception as e:
              return {"success": False, "error": str(e)}
 
+    @staticmethod
+    def _hangup_payload(call_control_id: str) -> dict:
+        return {
+            "call_control_id": call_control_id,
+            "command_id": "hangup_command"
+        }
+
+    @staticmethod
+    def _answer_payload(call_control_id: str, stream_url: str = None, stream_track: str = "both_tracks", mode: str = None, codec: str = None) -> dict:
+        payload = {
+            "call_control_id": call_control_id,
+            "command_id": "answer_command"
+        }
+        if stream_url:
+            # Support Streaming on Answer!
+            payload["stream_url"] = stream_url
+            payload["stream_track"] = stream_track
+            if mode:
+                payload["stream_bidirectional_mode"] = mode
+            if codec:
+                payload["stream_bidirectional_codec"] = codec
+
+            # Note: client_state is NOT supported in answer command usually, or at least not needed for stream setup here.
+            # We keep it simple.
+        return payload
+
+    @staticmethod
+    def _action_result(label: str, status_code: int, text: str, body) -> dict:
+        print(f"[DEBUG] {label} Response: {status_code} {text}")
+        if status_code >= 400:
+            return {"success": False, "error": text}
+
+        return {"success": True, "data": body()}
+
     def hangup_call(self, call_control_id: str) -> Dict:
         try:
             # Using telnyx sdk
@@ -382,24 +438,21 @@ class TelnyxProvider(SMSProvider):
             # call.hangup()
             
             # Using direct REST for consistency/safety
-            import requests
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "call_control_id": call_control_id,
-                "command_id": "hangup_command"
-            }
             # Telnyx Hangup Endpoint: https://api.telnyx.com/v2/calls/{call_control_id}/actions/hangup
             url = f"https://api.telnyx.com/v2/calls/{call_control_id}/actions/hangup"
-            resp = requests.post(url, headers=headers, json=payload)
-            print(f"[DEBUG] Hangup Response: {resp.status_code} {resp.text}")
-            
-            if resp.status_code >= 400:
-                return {"success": False, "error": resp.text}
-                
-            return {"success": True, "data": resp.json()}
+            resp = requests.post(url, headers=self._headers(), json=self._hangup_payload(call_control_id))
+            return self._action_result("Hangup", resp.status_code, resp.text, resp.json)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+    async def hangup_call_async(self, call_control_id: str) -> Dict:
+        """
+        Same as hangup_call(), on the shared async client so the media loop keeps running during the request.
+        """
+        try:
+            url = f"https://api.telnyx.com/v2/calls/{call_control_id}/actions/hangup"
+            resp = await HTTP_CLIENT.post(url, headers=self._headers(), json=self._hangup_payload(call_control_id))
+            return self._action_result("Hangup", resp.status_code, resp.text, resp.json)
         except Exception as e:
             return {"success": False, "error": str(e)}
 
@@ -408,35 +461,23 @@ class TelnyxProvider(SMSProvider):
         Answers an inbound call. Optionally starts streaming immediately if stream_url is provided.
         """
         try:
-             import requests
-             headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-             }
-             payload = {
-                 "call_control_id": call_control_id,
-                 "command_id": "answer_command"
-             }
-             if stream_url:
-                 # Support Streaming on Answer!
-                 payload["stream_url"] = stream_url
-                 payload["stream_track"] = stream_track
-                 if mode:
-                    payload["stream_bidirectional_mode"] = mode
-                 if codec:
-                    payload["stream_bidirectional_codec"] = codec
-                 
-                 # Note: client_state is NOT supported in answer command usually, or at least not needed for stream setup here.
-                 # We keep it simple.
+             payload = self._answer_payload(call_control_id, stream_url, stream_track, mode, codec)
+             print(f"[DEBUG] Answering Call {call_control_id} (Stream: {bool(stream_url)})... Payload: {json.dumps(payload, indent=2)}")
+             url = f"https://api.telnyx.com/v2/calls/{call_control_id}/actions/answer"
+             resp = requests.post(url, headers=self._headers(), json=payload)
+             return self._action_result("Answer", resp.status_code, resp.text, resp.json)
+        except Exception as e:
+             return {"success": False, "error": str(e)}
 
+    async def answer_call_async(self, call_control_id: str, stream_url: str = None, stream_track: str = "both_tracks", mode: str = None, codec: str = None) -> Dict:
+        """
+        Same as answer_call(), on the shared async client so the webhook doesn't block the event loop.
+        """
+        try:
+             payload = self._answer_payload(call_control_id, stream_url, stream_track, mode, codec)
              print(f"[DEBUG] Answering Call {call_control_id} (Stream: {bool(stream_url)})... Payload: {json.dumps(payload, indent=2)}")
              url = f"https://api.telnyx.com/v2/calls/{call_control_id}/actions/answer"
-             resp = requests.post(url, headers=headers, json=payload)
-             print(f"[DEBUG] Answer Response: {resp.status_code} {resp.text}")
-             
-             if resp.status_code >= 400:
-                 return {"success": False, "error": resp.text}
-                 
-             return {"success": True, "data": resp.json()}
+             resp = await HTTP_CLIENT.post(url, headers=self._headers(), json=payload)
+             return self._action_result("Answer", resp.status_code, resp.text, resp.json)
         except Exception as e:
              return {"success": False, "error": str(e)}
@@ -9,6 +9,7 @@ from ..models import ProviderConfig, MessageLog, VoiceConfig, CallLog
 from ..providers.telnyx import TelnyxProvider
 from ..providers.others import MockProvider, TwilioProvider, VonageProvider
 from ..utils.security import encrypt_value, decrypt_value
+from ..utils.config_cache import invalidate_voice_config, invalidate_provider_config
 
 router = APIRouter()
 
@@ -298,6 +299,7 @@ def create_provider(provider: ProviderConfigCreate, session: Session = Depends(g
     session.add(db_provider)
     session.commit()
     session.refresh(db_provider)
+    invalidate_provider_config()
     return db_provider
 
 @router.put("/config/providers/{provider_id}", response_model=ProviderConfig)
@@ -313,6 +315,7 @@ def update_provider(provider_id: int, provider: ProviderConfigCreate, session: S
     session.add(db_provider)
     session.commit()
     session.refresh(db_provider)
+    invalidate_provider_config()
     return db_provider
 
 @router.delete("/config/providers/{provider_id}")
@@ -322,6 +325,7 @@ def delete_provider(provider_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Provider not found")
     session.delete(provider)
     session.commit()
+    invalidate_provider_config()
     return {"ok": True}
 
 @router.get("/stats")
@@ -399,6 +403,7 @@ def save_voice_config(config: VoiceConfig, session: Session = Depends(get_sessio
         session.add(existing)
         session.commit()
         session.refresh(existing)
+        invalidate_voice_config()
         return existing
     else:
         if config.llm_api_key:
@@ -408,6 +413,7 @@ def save_voice_config(config: VoiceConfig, session: Session = Depends(get_sessio
         session.add(config)
         session.commit()
         session.refresh(config)
+        invalidate_voice_config()
         return config
 
 @router.get("/proxies/chatterbox/voices")
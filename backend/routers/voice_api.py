@@ -1,31 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Request, Query
+from fastapi.responses import JSONResponse
 from sqlmodel import Session, select
 from pydantic import BaseModel
 from typing import Optional
 import json
-import base64
-import struct
+import orjson
 import io
-import requests
 import httpx
 import re
 import audioop
 import math
 import uuid
+import secrets
+import traceback
 import asyncio
+import threading
 from asyncio import Queue
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from dataclasses import dataclass, field
 import urllib.parse
 import os
+import time
 
-from ..database import get_session
-from ..models import ProviderConfig, VoiceConfig, CallLog, UserChannel, MessageLog
+from ..database import engine, get_session
+from ..models import ProviderConfig, CallLog, UserChannel, MessageLog
 from ..providers.telnyx import TelnyxProvider
 from ..utils.parakeet import ParakeetClient
 from ..utils.chatterbox import ChatterboxClient
 from ..utils.security import decrypt_value
-from ..utils import openwebui
+from ..utils.config_cache import VOICE_CONFIG_DEFAULTS, get_voice_config_cached, get_voice_config_row, get_provider_api_key_cached, get_provider_by_webhook_token, invalidate_provider_config
+from ..utils.audio import b64encode_str, b64decode, b64_decoded_len, pcm16_samples, samples_to_ulaw, samples_to_alaw, FIRDecimator, get_decoder, rms as audio_rms, create_vad, is_speech, webrtcvad, PCMBuffer, WAV_HEADER_STRUCT
+from ..utils import openwebui, parakeet, chatterbox
 
-router = APIRouter()
+class OrjsonResponse(JSONResponse):
+    """JSONResponse rendered with orjson (webhook bursts are serialization heavy)."""
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+router = APIRouter(default_response_class=OrjsonResponse)
 
 PARALINGUISTIC_INSTRUCTIONS = """
 The TTS system supports Paralinguistic Tags. You can enhance realism by adding any of the following tags directly in the text:
@@ -43,6 +56,34 @@ Tips to good generation:
 Paralinguistic tags work best when they're used in context. For example, if you include a [gasp] tag, surrounding it with text that conveys surprise or shock will produce more natural and expressive results.
 """
 
+DEFAULT_SYSTEM_PROMPT = """
+You are a helpful AI assistant.
+"""
+
+TOOL_INSTRUCTIONS = """
+You can control the call by outputting a JSON block at the very end of your response.
+Available Tools:
+- hangup: Ends the call. Use this when the user says goodbye or wants to stop.
+
+If you decide to hangup, you MUST generate a polite sign-off message (e.g., "Goodbye!", "Have a nice day!") before the JSON block in the "[Your spoken response here]" section.
+
+Format:
+[Your spoken response here]
+```json
+{
+  "action": "hangup",
+  "reason": "user said goodbye"
+}
+```
+IMPORTANT: Do NOT output any text after the JSON block. Do NOT read the JSON block aloud.
+"""
+
+# Max user/assistant messages sent to the LLM per turn (oldest are dropped first)
+MAX_HISTORY_MESSAGES = int(os.getenv("MAX_HISTORY_MESSAGES", 20))
+
+# Constant tail appended to every conversation system prompt (built once)
+SYSTEM_PROMPT_SUFFIX = "\n" + TOOL_INSTRUCTIONS + "\n" + PARALINGUISTIC_INSTRUCTIONS
+
 class CallRequest(BaseModel):
     to_number: str
     provider: str # Required now
@@ -73,19 +114,266 @@ class AssignProfileRequest(BaseModel):
     api_key: Optional[str] = None
     provider_id: Optional[int] = None
 
+DEFAULT_LIMIT_MESSAGE = "This call has reached its time limit. Goodbye."
+
+# Base URL classification for stream URLs: LAN/loopback hosts Telnyx can't reach, and public tunnels (always TLS)
+LOCAL_URL_RE = re.compile(r'192\.168|localhost|127\.0\.0\.1')
+TUNNEL_HOST_RE = re.compile(r'ngrok|sandoval\.io|loca\.lt')
+
+def stream_url_origin(base_url: str, forwarded_scheme: Optional[str] = None) -> tuple:
+    """
+    Splits a public base URL into (host[:port][/path], "wss" | "ws") for building the media stream URL.
+    Robust WSS detection: WSS if base_url is https, X-Forwarded-Proto is https,
+    or the host looks like a public tunnel (typically HTTPS).
+    A base URL without a scheme (e.g. "example.com:8080") is treated as host[:port][/path].
+    """
+    # urlsplit reads "host:port" as scheme "host"; a leading "//" makes it parse as a netloc
+    parts = urllib.parse.urlsplit(base_url if "://" in base_url else "//" + base_url)
+    base_clean = parts.netloc + parts.path if parts.netloc else parts.path
+    is_secure = (
+        parts.scheme == "https"
+        or (forwarded_scheme is not None and "https" in str(forwarded_scheme).lower())
+        or TUNNEL_HOST_RE.search(parts.netloc or base_clean) is not None
+    )
+    return base_clean, ("wss" if is_secure else "ws")
+
+# Sentence boundary for streaming LLM output into TTS: terminal punctuation (optionally closed by a quote/bracket) + whitespace
+SENTENCE_END_RE = re.compile(r'[.?!]["\')\]]?\s')
+
+# Shared LLM HTTP client: connections (and TLS sessions) are kept alive between turns and calls
+# instead of opening a new one per request. Closed in the app lifespan.
+LLM_HTTP_CLIENT = httpx.AsyncClient(http2=True, limits=httpx.Limits(max_keepalive_connections=64, keepalive_expiry=60))
+
+async def warm_up_connections():
+    """
+    Opens a pooled connection to each configured STT / TTS / LLM server (TCP + TLS + HTTP/2 setup) at startup,
+    so the first call doesn't pay for it. Failures are ignored: the services may not be up yet.
+    """
+    try:
+        vc = get_voice_config_cached()
+    except Exception as e:
+        print(f"[WARN] Connection warm-up skipped: {e}")
+        return
+
+    async def _head(client: httpx.AsyncClient, url: str):
+        try:
+            await client.head(url, timeout=5)
+        except Exception as e:
+            print(f"[DEBUG] Warm-up of {url} failed: {e}")
+
+    await asyncio.gather(
+        _head(parakeet.HTTP_CLIENT, vc["stt_url"]),
+        _head(chatterbox.HTTP_CLIENT, vc["tts_url"]),
+        _head(LLM_HTTP_CLIENT, vc["llm_url"]),
+    )
+
+# Tool call block at the end of an LLM reply: fenced ```json {...} ``` or a bare trailing {...}
+TOOL_JSON_FENCE_RE = re.compile(r'```json\s*(\{.*?\})\s*```', re.DOTALL)
+TOOL_JSON_TAIL_RE = re.compile(r'(\{[\s\S]*?\})\s*\Z')
+
+# Pulls choices[0].delta.content straight out of an SSE chunk without parsing the whole JSON
+SSE_DELTA_CONTENT_RE = re.compile(r'"delta"\s*:\s*\{[^{}]*?"content"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+def extract_delta_content(data: str) -> str:
+    """
+    Returns the delta text of one streamed chat completion chunk ("" if none).
+    Plain deltas are sliced out directly and escaped ones are decoded as a lone JSON string.
+    Only chunks of an unexpected shape (e.g. "content": null) are fully parsed.
+    """
+    if '"content"' not in data:
+        # role-only / finish_reason chunks
+        return ""
+    match = SSE_DELTA_CONTENT_RE.search(data)
+    if match:
+        text = match.group(1)
+        return orjson.loads('"' + text + '"') if "\\" in text else text
+    chunk_json = orjson.loads(data)
+    return chunk_json.get("choices", [{}])[0].get("delta", {}).get("content") or ""
+
+@dataclass(slots=True)
+class StreamMapping:
+    """
+    Everything the media stream `short_id` needs about its call (STREAM_ID_MAP value).
+    One entry per call, so the websocket handler resolves all of it with a single lookup.
+    """
+    call_id: str
+    db_id: Optional[int] = None # None until the CallLog row exists
+    db_insert: Optional[asyncio.Future] = None # Pending inbound CallLog insert (worker thread)
+    prompt: Optional[str] = None
+    max_duration: int = 600
+    limit_message: str = DEFAULT_LIMIT_MESSAGE
+    context: dict = field(default_factory=dict) # user_id, chat_id, initial_greeting
+    stream_queue: Optional[Queue] = None # Preloaded greeting media chunks (None chunk = EOF)
+
+    def take_stream_queue(self) -> Optional[Queue]:
+        """Returns the preloaded greeting queue and detaches it: the queue is consumed exactly once."""
+        queue, self.stream_queue = self.stream_queue, None
+        return queue
+
 # --- Audio Utilities ---
-PRELOADED_STREAMS = {} # call_id -> asyncio.Queue of media chunks (or None for EOF)
-STREAM_ID_MAP = {} # short_id -> call_id
-CALL_CONTEXT = {} # call_id -> {user_id, chat_id}
-DEBUG_AUDIO_DIR = "backend/debug_audio"
-if not os.path.exists(DEBUG_AUDIO_DIR):
-    os.makedirs(DEBUG_AUDIO_DIR, exist_ok=True)
+STREAM_ID_MAP = {} # short_id -> StreamMapping
+BACKGROUND_TASKS = set() # Strong refs to fire-and-forget tasks so they aren't garbage collected mid-run
+# 20ms wake-up frame sent on 'connected' (before the codec is negotiated), base64-encoded once at import
+HANDSHAKE_SILENCE_B64 = b64encode_str(b'\x00' * 160)
+# End-of-utterance silence. WebRTC VAD is reliable enough for a short hangover; the RMS gate needs a longer one.
+VAD_SILENCE_SEC = float(os.getenv("VAD_SILENCE_SEC", "0.3" if webrtcvad else "1.2"))
+# Endpointing limits in bytes of buffered PCM16 @ 8kHz (16000 bytes/sec): per-packet checks are plain int compares
+PCM16_BYTES_PER_SEC = 16000
+VAD_SILENCE_BYTES = int(VAD_SILENCE_SEC * PCM16_BYTES_PER_SEC)
+MIN_UTTERANCE_BYTES = int(0.5 * PCM16_BYTES_PER_SEC) # Minimum speech captured before a silence flush
+MAX_UTTERANCE_BYTES = int(15.0 * PCM16_BYTES_PER_SEC) # Failsafe flush
+# STT time grows with audio length: longer utterances are cut at a pause near the middle and the
+# two halves are transcribed in parallel (see transcribe_utterance)
+LONG_UTTERANCE_BYTES = int(8.0 * PCM16_BYTES_PER_SEC)
+
+# STT results that don't start a turn (no LLM / TTS round trip): text without any word characters, and the
+# comma-separated STT_IGNORE_PHRASES (e.g. "you,thank you" for what an ASR model hallucinates on line noise).
+# Compared case-insensitively, ignoring punctuation.
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+def normalize_transcript(text: str) -> str:
+    return _NON_WORD_RE.sub(" ", text).strip().lower()
+
+STT_IGNORE_PHRASES = frozenset(filter(None, map(normalize_transcript, os.getenv("STT_IGNORE_PHRASES", "").split(","))))
+
+
+
+# Thread pool for the CPU-bound part of TTS processing (resample + encode + base64 + JSON).
+# Keeps the event loop free for WebSocket sends / receives when several calls are active.
+TTS_ENCODE_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="tts-encode")
+
+# Small dedicated pool for end-of-call bookkeeping (CallLog update + inbound alert). Bounded so a burst of
+# hangups holds at most this many DB connections, and it never competes with TTS encoding for threads.
+CALL_FINALIZE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="call-finalize")
+
+# Upper bound for one outbound media frame. Audio that is ready at the same time is coalesced
+# into frames of up to this length instead of one WebSocket message per 20ms block.
+MAX_MEDIA_FRAME_MS = 100
 
+# Max sentences synthesized in parallel per call. Later sentences are rendered while earlier ones play.
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", 3))
+
+# How far a FramePacer may fall behind schedule before it re-anchors instead of catching up
+PACER_MAX_LAG = MAX_MEDIA_FRAME_MS / 1000
+
+# How long hangup waits for the cancelled greeting sender to unwind before closing the socket anyway
+SENDER_DRAIN_SEC = 0.1
+
+# Extra time after playback ends before listening again (line echo of the bot's own voice)
+ECHO_TAIL_SEC = float(os.getenv("ECHO_TAIL_SEC", 0.3))
+
+# Silent 20ms frames sent first on every stream to establish the audio path (0.5s)
+SILENCE_BURST_FRAMES = 25
+
+class FramePacer:
+    """
+    Paces real-time audio sends against absolute deadlines on the event loop clock.
+    Sleeping a fixed frame length after each send lets the send time itself accumulate as drift;
+    here each wait ends at the frame's scheduled end, and a late frame shortens the next wait.
+    If the producer stalled (e.g. waiting on TTS) for more than PACER_MAX_LAG the schedule is
+    re-anchored instead of bursting to catch up.
+    """
+    __slots__ = ("next_tick",)
+
+    def __init__(self):
+        self.next_tick = None
+
+    async def wait(self, duration: float):
+        now = asyncio.get_running_loop().time()
+        if self.next_tick is None or now - self.next_tick > PACER_MAX_LAG:
+            self.next_tick = now
+        self.next_tick += duration
+        delay = self.next_tick - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def transcribe_utterance(stt_client: ParakeetClient, buffer: PCMBuffer, timeout) -> str:
+    """
+    Transcribes the buffered utterance. Up to LONG_UTTERANCE_BYTES it is one STT request; beyond that it
+    is split at the quietest 20ms frame of its middle third and both halves are sent at once.
+    """
+    buffered = len(buffer)
+    if buffered <= LONG_UTTERANCE_BYTES:
+        return await stt_client.transcribe_async(buffer.to_wav(sample_rate=8000), timeout=timeout)
+
+    split = buffer.quietest_split(buffered // 3, buffered * 2 // 3)
+    print(f"[DEBUG] Long utterance ({buffered / PCM16_BYTES_PER_SEC:.2f}s): transcribing in two parts split at {split / PCM16_BYTES_PER_SEC:.2f}s")
+    parts = await asyncio.gather(
+        stt_client.transcribe_async(buffer.to_wav(sample_rate=8000, end=split), timeout=timeout),
+        stt_client.transcribe_async(buffer.to_wav(sample_rate=8000, start=split), timeout=timeout),
+    )
+    return " ".join(part.strip() for part in parts if part and part.strip())
+
+def playback_remaining(total_sent_bytes: int, speech_start_time: Optional[float], bytes_per_sec: int) -> float:
+    """
+    Seconds of already-sent TTS audio the caller has not heard yet.
+    bytes_per_sec: L16 (16-bit, 8kHz) = 16000, PCMU/PCMA (8-bit, 8kHz) = 8000.
+    """
+    if total_sent_bytes <= 0:
+        return 0.0
+    speech_duration = total_sent_bytes / float(bytes_per_sec)
+    if speech_start_time is None:
+        return speech_duration
+    elapsed = time.monotonic() - speech_start_time
+    return max(0.0, speech_duration - elapsed)
+
+def _encode_tts_blocks(blocks: list, in_rate: int, codec: str, state):
+    """
+    Resamples/transcodes a batch of raw PCM16 blocks and returns (payloads, state): base64 media payloads.
+    Runs inside TTS_ENCODE_POOL. Blocks of one stream are processed strictly in order
+    because the resampler state (FIRDecimator or ratecv tuple) is carried from one batch to the next.
+    The encoded audio of the whole batch is coalesced into frames of at most MAX_MEDIA_FRAME_MS.
+    Payloads are not wrapped in a JSON envelope here; the sender splices them into its pre-serialized one.
+    """
+    # Target Rate: 8000 for L16 (Telnyx PSTN usually forces 8k even for L16), 8000 for PCMU/PCMA
+    target_rate = 8000
+    payloads = []
+
+    # Resample if needed. The blocks are contiguous audio, so the batch is processed in one pass
+    # and stays an int16 array until it is encoded (no intermediate PCM bytes for PCMU/PCMA).
+    samples = pcm16_samples(b"".join(blocks))
+    if in_rate != target_rate:
+        try:
+            if in_rate > target_rate and in_rate % target_rate == 0:
+                # Integer ratio (24kHz TTS output is the common case): vectorized FIR decimation
+                if state is None:
+                    state = FIRDecimator(in_rate // target_rate)
+                samples = state.process(samples)
+            else:
+                processed, state = audioop.ratecv(samples.tobytes(), 2, 1, in_rate, target_rate, state)
+                samples = pcm16_samples(processed)
+        except Exception as e:
+            print(f"Resampling error (block): {e}")
+            return payloads, state
 
+    # Encode (G.711 via lookup tables)
+    try:
+        if codec == "L16":
+            encoded = samples.tobytes()
+        elif codec == "PCMA":
+            encoded = samples_to_alaw(samples)
+        else:
+            encoded = samples_to_ulaw(samples)
+    except Exception as e:
+        print(f"Encoding error: {e}")
+        return payloads, state
+
+    # Base64 the whole batch in one call and slice the result into frames.
+    # Frame sizes are a multiple of 3 bytes (one base64 quantum, so no padding mid-stream)
+    # and of 2 bytes (whole L16 samples).
+    bytes_per_sample = 2 if codec == "L16" else 1
+    max_frame_bytes = target_rate * MAX_MEDIA_FRAME_MS // 1000 * bytes_per_sample
+    max_frame_bytes -= max_frame_bytes % 6
+    encoded_b64 = b64encode_str(encoded)
+    frame_chars = max_frame_bytes // 3 * 4
+    for offset in range(0, len(encoded_b64), frame_chars):
+        payloads.append(encoded_b64[offset:offset + frame_chars])
+
+    return payloads, state
 
 def process_tts_stream(audio_stream, voice_id: str, codec: str = "PCMU"):
     """
-    Consumes an ASYNC audio stream (PCM/WAV), resamples/transcodes it, and YIELDS encoded chunks as JSON strings.
+    Consumes an ASYNC audio stream (PCM/WAV), resamples/transcodes it, and YIELDS base64 media payloads.
     WARNING: Because this yields, it must be iterated with 'async for' by the caller if audio_stream is async.
     Actually, creating an 'async generator' requires 'async def'.
     """
@@ -93,9 +381,11 @@ def process_tts_stream(audio_stream, voice_id: str, codec: str = "PCMU"):
 
 async def _process_tts_stream_async(audio_stream, voice_id, codec):
     """
-    Async implementation of audio processing
+    Async implementation of audio processing.
+    Network reads stay on the event loop; resampling/encoding is dispatched to TTS_ENCODE_POOL.
     """
     print(f"Processing TTS Stream for Voice: {voice_id} (Target Codec: {codec})")
+    loop = asyncio.get_running_loop()
     
     # State for resampling/transcoding
     state = None
@@ -104,100 +394,71 @@ async def _process_tts_stream_async(audio_stream, voice_id, codec):
     # WAV Header Parsing State
     header_parsed = False
     header_buffer = bytearray()
-    HEADER_SIZE = 44
+    HEADER_SIZE = WAV_HEADER_STRUCT.size # 44
     
     in_rate = 24000 # Default fallback
     
+    # This prevents 'not a whole number of frames' errors in audioop
+    BLOCK_SIZE = 960
+    
     async for chunk in audio_stream:
-        if not header_parsed:
+        if header_parsed:
+            audio_buffer.extend(chunk)
+        else:
             header_buffer.extend(chunk)
-            if len(header_buffer) >= HEADER_SIZE:
-                # Parse RIFF Header to find Sample Rate
-                try:
-                    # .. Check RIFF ...
-                     rate_packed = header_buffer[24:28]
-                     in_rate = struct.unpack('<I', rate_packed)[0]
-                     print(f"Detected TTS Sample Rate: {in_rate}Hz")
-                     header_parsed = True
-                     
-                     # Process remaining bytes in this chunk as audio
-                     remaining = header_buffer[HEADER_SIZE:]
-                     audio_buffer.extend(remaining)
-                except Exception as e:
-                    print(f"Error parsing WAV header: {e}. Defaulting to 24000.")
-                    header_parsed = True # Skip parsing to avoid stuck loop
-                    audio_buffer.extend(header_buffer)
-            continue
-            
-        audio_buffer.extend(chunk)
-        
-        # This prevents 'not a whole number of frames' errors in audioop
-        BLOCK_SIZE = 960
+            if len(header_buffer) < HEADER_SIZE:
+                continue
+            header_parsed = True
+
+            # Parse RIFF Header (one precompiled struct) to find Sample Rate
+            fields = WAV_HEADER_STRUCT.unpack_from(header_buffer)
+            if fields[0] == b'RIFF' and fields[2] == b'WAVE':
+                in_rate = fields[7]
+                print(f"Detected TTS Sample Rate: {in_rate}Hz")
+                # Process remaining bytes as audio
+                del header_buffer[:HEADER_SIZE]
+            else:
+                print(f"No WAV header in TTS stream. Defaulting to {in_rate}Hz raw PCM.")
+            audio_buffer = header_buffer
         
-        while len(audio_buffer) >= BLOCK_SIZE:
-             # Extract block
-            raw_block = bytes(audio_buffer[:BLOCK_SIZE])
-            del audio_buffer[:BLOCK_SIZE]
-            
-            # Target Rate: 8000 for L16 (Telnyx PSTN usually forces 8k even for L16), 8000 for PCMU/PCMA
-            target_rate = 8000
-            
-            # Resample if needed
-            processed_block = raw_block
-            if in_rate != target_rate:
-                try:
-                    processed_block, state = audioop.ratecv(raw_block, 2, 1, in_rate, target_rate, state)
-                except Exception as e:
-                    print(f"Resampling error (block): {e}")
-                    continue
+        if len(audio_buffer) < BLOCK_SIZE:
+            continue
 
-            # Encode
-            try:
-               if codec == "L16":
-                   encoded_data = processed_block
-               elif codec == "PCMA":
-                   encoded_data = audioop.lin2alaw(processed_block, 2)
-               else:
-                   encoded_data = audioop.lin2ulaw(processed_block, 2)
-
-               b64_payload = base64.b64encode(encoded_data).decode('utf-8')
-               yield json.dumps({
-                   "event": "media", 
-                   "media": {
-                       "payload": b64_payload
-                   }
-               })
-            except Exception as e:
-                print(f"Encoding error: {e}")
+        # Extract every complete block received so far and encode them as one batch.
+        # Copied out through a memoryview (one copy, not slice + bytes); the carried-over remainder is < BLOCK_SIZE,
+        # so the del only ever moves a partial block.
+        usable = len(audio_buffer) - (len(audio_buffer) % BLOCK_SIZE)
+        with memoryview(audio_buffer) as view:
+            blocks = [view[:usable].tobytes()]
+        del audio_buffer[:usable]
+
+        payloads, state = await loop.run_in_executor(TTS_ENCODE_POOL, _encode_tts_blocks, blocks, in_rate, codec, state)
+        for payload in payloads:
+            yield payload
 
     # Process remaining remainder (if even)
     if len(audio_buffer) > 0 and len(audio_buffer) % 2 == 0:
-         target_rate = 8000
          try:
-             processed_block = bytes(audio_buffer)
-             if in_rate != target_rate:
-                  processed_block, state = audioop.ratecv(bytes(audio_buffer), 2, 1, in_rate, target_rate, state)
-             
-             if codec == "L16":
-                encoded_data = processed_block
-             elif codec == "PCMA":
-                encoded_data = audioop.lin2alaw(processed_block, 2)
-             else:
-                encoded_data = audioop.lin2ulaw(processed_block, 2)
-                
-             b64_payload = base64.b64encode(encoded_data).decode('utf-8')
-             yield json.dumps({"event": "media", "media": {"payload": b64_payload}})
+             payloads, state = await loop.run_in_executor(TTS_ENCODE_POOL, _encode_tts_blocks, [bytes(audio_buffer)], in_rate, codec, state)
+             for payload in payloads:
+                 yield payload
          except Exception as e:
              print(f"Remainder error: {e}")
 
-async def generate_initial_audio(prompt: str, voice_config_data: dict, stream_queue: Optional[Queue] = None, call_id: Optional[str] = None) -> tuple:
+async def generate_initial_audio(prompt: str, voice_config_data: dict, stream_queue: Optional[Queue] = None, call_id: Optional[str] = None, context: Optional[dict] = None) -> tuple:
     """
     Generate audio chunks for the prompt.
     If stream_queue is provided, pushes chunks to it asynchronously.
+    The LLM reply is streamed and every completed sentence goes to TTS right away, so the first audio
+    is ready after the first sentence rather than after the whole reply.
+    The greeting text is stored in `context` (the call's StreamMapping.context) as soon as the LLM reply is complete.
     Returns (audio_buffer, text).
     """
     print(f"Generating initial audio for prompt: {prompt}")
     audio_buffer = []
+    reply = None
+    tts_tasks = []
+    forward_task = None
     try:
         # 1. LLM Generation
         llm_url = voice_config_data.get("llm_url")
@@ -207,6 +468,7 @@ async def generate_initial_audio(prompt: str, voice_config_data: dict, stream_qu
         llm_timeout = voice_config_data.get("llm_timeout", 10)
         tts_timeout = voice_config_data.get("tts_timeout", 10)
         tts_url = voice_config_data.get("tts_url", "http://chatterbox:8000")
+        codec = voice_config_data.get("rtp_codec", "PCMU")
         
         system_prompt = voice_config_data.get("system_prompt")
         
@@ -224,100 +486,137 @@ async def generate_initial_audio(prompt: str, voice_config_data: dict, stream_qu
                 {"role": "system", "content": final_system_message},
                 {"role": "user", "content": "Introduce yourself."}
             ],
-            "stream": False 
+            "stream": True
         }
         print(f"[DEBUG] Initial Audio Context: {chat_payload['messages']}")
         headers = {"Authorization": f"Bearer {llm_api_key}"} if llm_api_key else {}
-        
-        reply = None
+
+        # 2. TTS Generation, pipelined behind the LLM stream (same scheme as a conversation turn):
+        # each sentence is synthesized into its own queue, and forward_audio() drains them in order.
+        tts_client = ChatterboxClient(base_url=tts_url)
+        tts_sem = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+        sentence_queue = Queue()
+
+        async def synth_sentence(sentence, out):
+            try:
+                async with tts_sem:
+                    tts_stream = tts_client.speak_stream(sentence, voice_id=voice_id, timeout=tts_timeout)
+                    async for payload in process_tts_stream(tts_stream, voice_id, codec=codec):
+                        out.put_nowait(payload)
+            except Exception as e:
+                print(f"TTS Error: {e}")
+            finally:
+                out.put_nowait(None)
+
+        def queue_sentence(sentence):
+            out = Queue()
+            tts_tasks.append(asyncio.create_task(synth_sentence(sentence, out)))
+            sentence_queue.put_nowait(out)
+
+        async def forward_audio():
+            while (frames := await sentence_queue.get()) is not None:
+                while (payload := await frames.get()) is not None:
+                    if len(audio_buffer) == 0:
+                        print(f"[DEBUG] [Producer] First audio chunk generated and pushed to queue!")
+                    audio_buffer.append(payload)
+                    if stream_queue:
+                        stream_queue.put_nowait(payload) # Unbounded queue: never blocks, no coroutine round trip per frame
+
+        forward_task = asyncio.create_task(forward_audio())
+
+        reply_parts = []
         try:
-            import time
             start_ts = time.time()
-            async with httpx.AsyncClient(timeout=llm_timeout) as client:
-                llm_resp = await client.post(f"{llm_url.rstrip('/')}/chat/completions", json=chat_payload, headers=headers)
-            
-            latency = time.time() - start_ts
-            print(f"[DEBUG] LLM Latency (Initial): {latency:.2f}s")
-            
-            if llm_resp.status_code == 200:
-                reply = llm_resp.json().get("choices", [{}])[0].get("message", {}).get("content", "")
-                print(f"Agent Reply: {reply}")
-            else:
-                 print(f"LLM Error: {llm_resp.status_code} {llm_resp.text}")
-        except Exception as e:
-            print(f"LLM Exception: {e}")
-            
+            pending_text = ""
+            async with LLM_HTTP_CLIENT.stream(
+                "POST",
+                f"{llm_url.rstrip('/')}/chat/completions",
+                json=chat_payload,
+                headers=headers,
+                timeout=llm_timeout,
+            ) as llm_resp:
+                latency = time.time() - start_ts
+                print(f"[DEBUG] LLM Latency (Initial): {latency:.2f}s")
+
+                if llm_resp.status_code == 200:
+                    async for line in llm_resp.aiter_lines():
+                        if not line.startswith("data: "):
+                            continue
+                        content = line[6:]
+                        if content == "[DONE]": break
+                        try:
+                            delta = extract_delta_content(content)
+                        except: continue
+                        if not delta:
+                            continue
+
+                        reply_parts.append(delta)
+                        pending_text += delta
+                        consumed = 0
+                        for boundary in SENTENCE_END_RE.finditer(pending_text):
+                            sentence = pending_text[consumed:boundary.end()].strip()
+                            consumed = boundary.end()
+                            if sentence:
+                                queue_sentence(sentence)
+                        pending_text = pending_text[consumed:]
+
+                    if pending_text.strip():
+                        queue_sentence(pending_text.strip())
+                    reply = "".join(reply_parts)
+                    print(f"Agent Reply: {reply}")
+                else:
+                    await llm_resp.aread()
+                    print(f"LLM Error: {llm_resp.status_code} {llm_resp.text}")
         except Exception as e:
             print(f"LLM Exception: {e}")
+            # Sentences streamed before the failure are already being spoken; keep them as the greeting
+            reply = "".join(reply_parts).strip() or None
             
         if reply:
             # IMMEDIATE CONTEXT UPDATE (Fix for Missing Greeting)
-            if call_id:
-                if call_id not in CALL_CONTEXT: CALL_CONTEXT[call_id] = {}
-                CALL_CONTEXT[call_id]["initial_greeting"] = reply
-                print(f"[DEBUG] Stored initial greeting for {call_id} immediately after LLM generation.")
+            if context is not None:
+                context["initial_greeting"] = reply
+                print(f"[DEBUG] Stored initial greeting for {call_id or 'pending call'} immediately after LLM generation.")
 
-            # 2. TTS Generation
-            try:
-                tts_client = ChatterboxClient(base_url=tts_url)
-                tts_stream = tts_client.speak_stream(reply, voice_id=voice_id, timeout=tts_timeout)
-                codec = voice_config_data.get("rtp_codec", "PCMU")
-                
-                async for msg_json in process_tts_stream(tts_stream, voice_id, codec=codec):
-                    if len(audio_buffer) == 0:
-                        print(f"[DEBUG] [Producer] First audio chunk generated and pushed to queue!")
-                    audio_buffer.append(msg_json)
-                    if stream_queue:
-                        await stream_queue.put(msg_json)
-                    
-                print(f"Audio generation complete. Buffered {len(audio_buffer)} chunks.")
-                
-            except Exception as e:
-                print(f"TTS Error: {e}")
+        # Wait for the remaining sentences to be synthesized and forwarded
+        sentence_queue.put_nowait(None)
+        await forward_task
+        if reply:
+            print(f"Audio generation complete. Buffered {len(audio_buffer)} chunks.")
                 
     except Exception as e:
         print(f"General Generation Error: {e}")
+    finally:
+        # Only does anything if generation was cancelled or failed half way
+        for task in tts_tasks:
+            task.cancel()
+        if forward_task:
+            forward_task.cancel()
         
     # Signal EOF to queue
     if stream_queue:
-        await stream_queue.put(None)
+        stream_queue.put_nowait(None)
         
     return audio_buffer, reply if reply else ""
 
-async def preload_inbound_audio(call_control_id: str, prompt: str, voice_config_data: dict):
+async def preload_inbound_audio(mapping: StreamMapping, prompt: str, voice_config_data: dict):
     """
     Background task to generate and store initial audio for inbound calls.
+    The media queue and the greeting text are attached to the call's StreamMapping.
     """
+    call_control_id = mapping.call_id
     print(f"[DEBUG] interactive_preload: Starting generation for {call_control_id} (Prompt: {prompt})")
     stream_queue = Queue()
-    PRELOADED_STREAMS[call_control_id] = stream_queue
+    mapping.stream_queue = stream_queue
     
-    # Generate will push to queue (streaming)
-    _, text = await generate_initial_audio(prompt, voice_config_data, stream_queue=stream_queue, call_id=call_control_id)
+    # Generate will push to queue (streaming); the greeting text lands in mapping.context
+    _, text = await generate_initial_audio(prompt, voice_config_data, stream_queue=stream_queue, call_id=call_control_id, context=mapping.context)
     
     if text:
-        print(f"[DEBUG] interactive_preload: Storing initial greeting for {call_control_id}: '{text}'")
-        if call_control_id not in CALL_CONTEXT:
-            CALL_CONTEXT[call_control_id] = {}
-        CALL_CONTEXT[call_control_id]["initial_greeting"] = text
+        print(f"[DEBUG] interactive_preload: Stored initial greeting for {call_control_id}: '{text}'")
 
     print(f"[DEBUG] interactive_preload: Generation task finished for {call_control_id}")
 
-def create_wav_header(pcm_data: bytes, sample_rate: int = 8000, channels: int = 1, bits_per_sample: int = 16) -> bytes:
-    header = b'RIFF'
-    header += struct.pack('<I', 36 + len(pcm_data))
-    header += b'WAVEfmt '
-    header += struct.pack('<I', 16) 
-    header += struct.pack('<H', 1) 
-    header += struct.pack('<H', channels)
-    header += struct.pack('<I', sample_rate)
-    header += struct.pack('<I', sample_rate * channels * (bits_per_sample // 8))
-    header += struct.pack('<H', channels * (bits_per_sample // 8))
-    header += struct.pack('<H', bits_per_sample)
-    header += b'data'
-    header += struct.pack('<I', len(pcm_data))
-    return header + pcm_data
-
 @router.websocket("/voice/stream/{short_id}")
 async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optional[str] = None, delay_ms: int = 0):
     await websocket.accept()
@@ -328,9 +627,9 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
         await websocket.close()
         return
 
-    call_id = map_data.get("call_id") if isinstance(map_data, dict) else map_data
-    db_id = map_data.get("db_id") if isinstance(map_data, dict) else None
-    initial_prompt = map_data.get("prompt") if isinstance(map_data, dict) else None
+    call_id = map_data.call_id
+    db_id = map_data.db_id
+    initial_prompt = map_data.prompt
 
     print(f"WebSocket connected for short_id: {short_id} -> call_id: {call_id} (Token: {token})")
     print(f"WS ID: {call_id}. DB ID: {db_id}. Prompt Override: {bool(initial_prompt)}")
@@ -342,25 +641,26 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
         print("[DEBUG] Entering Handshake Loop...")
         while True:
             data = await websocket.receive_text()
-            msg = json.loads(data)
+            msg = orjson.loads(data)
             event = msg.get("event")
             print(f"[DEBUG] Handshake Event: {event}")
 
             if event == "connected":
                  print(f"[DEBUG] Received 'connected'. sending silence to wake up stream...")
                  # Send 1 second of silence to "wake up" the stream / satisfy Telnyx initial media requirement
-                 silence_frame = b'\x00' * 160 # 20ms of silence (PCMU/8k)
+                 # Every frame is identical, so it is serialized once
+                 media_message = orjson.dumps({
+                     "event": "media",
+                     "media": {
+                         "payload": HANDSHAKE_SILENCE_B64,
+                         "stream_id": short_id
+                     }
+                 }).decode()
                  # Send a burst of 50 frames (1 second)
+                 pacer = FramePacer()
                  for _ in range(50):
-                      media_message = {
-                          "event": "media",
-                          "media": {
-                              "payload": base64.b64encode(silence_frame).decode(),
-                              "stream_id": short_id
-                          }
-                      }
-                      await websocket.send_text(json.dumps(media_message))
-                      await asyncio.sleep(0.02)
+                      await websocket.send_text(media_message)
+                      await pacer.wait(0.02)
                  print("[DEBUG] Initial silence sent. Waiting for 'start'...")
                  continue
             elif event == "start":
@@ -394,16 +694,13 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
         except: pass
         return
 
-    session_gen = get_session()
-    session = next(session_gen)
-    
     # Config default lookup
     stt_url = "http://parakeet:8000"
     tts_url = "http://chatterbox:8000"
     
     # Duration limit setup
-    max_duration = map_data.get("max_duration", 600) if isinstance(map_data, dict) else 600
-    limit_message = map_data.get("limit_message", "This call has reached its time limit. Goodbye.") if isinstance(map_data, dict) else "This call has reached its time limit. Goodbye."
+    max_duration = map_data.max_duration
+    limit_message = map_data.limit_message
     
     # Define monitor task
     async def monitor_call_duration():
@@ -425,23 +722,15 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
                  # Cancel sender task to release socket if needed, though concurrency allows mixing.
                  # But we want to INTERRUPT.
                  
-                 # Send interrupt silence first
-                 interrupt_silence = json.dumps({
-                     "event": "clear", # Hypothetical clear event or just silence
-                     "stream_id": stream_id
-                 })
-                 # await websocket.send_text(interrupt_silence) 
-                 
                  # Stream TTS
                  tts_stream = tts_client.speak_stream(limit_message, voice_id=voice_id, timeout=10)
                  
                  print(f"[DEBUG] Call Monitor: Streaming limit message...")
-                 async for msg_json in process_tts_stream(tts_stream, voice_id, codec=rtp_codec):
-                      # Inject stream_id
-                      chunk_obj = json.loads(msg_json)
-                      chunk_obj["stream_id"] = short_id
+                 # The monitor addresses the stream by short_id
+                 monitor_prefix = '{"event": "media", "stream_id": ' + orjson.dumps(short_id).decode() + ', "media": {"payload": "'
+                 async for payload in process_tts_stream(tts_stream, voice_id, codec=rtp_codec):
                       try:
-                          await websocket.send_text(json.dumps(chunk_obj))
+                          await websocket.send_text(monitor_prefix + payload + '"}}')
                       except RuntimeError as e:
                            if "close message has been sent" in str(e):
                                print("[DEBUG] Call Monitor: Socket closed during TTS. Stopping.")
@@ -453,7 +742,6 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
 
             except Exception as e:
                  print(f"[ERROR] Call Monitor TTS Exception: {e}")
-                 import traceback
                  traceback.print_exc()
 
             print(f"[DEBUG] Call Monitor: Initiating Hard Hangup for {call_id}...")
@@ -470,16 +758,14 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
                 
                 # Try to get from DB if possible
                 if not api_key:
-                    # Quick separate session lookup if needed, or rely on Env.
-                    pass
+                    api_key = telnyx_api_key or get_provider_api_key_cached("telnyx")
 
                 if api_key:
-                    from ..providers.telnyx import TelnyxProvider
                     provider = TelnyxProvider(api_key=api_key)
                     # Use 'call_id' which is the Telnyx Call Control ID mapped to 'short_id' in our loop?
                     # Wait, 'call_id' variable in this scope IS the call_control_id (v3:...) passed to websocket_endpoint
                     print(f"[DEBUG] Call Monitor: Sending Hangup Command for {call_id}...")
-                    result = provider.hangup_call(call_id)
+                    result = await provider.hangup_call_async(call_id)
                     print(f"[DEBUG] Call Monitor: Hangup Result: {result}")
                 else:
                     print(f"[WARN] Call Monitor: No API Key found for hard hangup.")
@@ -498,24 +784,28 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
     monitor_task = asyncio.create_task(monitor_call_duration())
 
     try:
-        voice_config = session.exec(select(VoiceConfig)).first()
-        llm_url = (voice_config.llm_url if voice_config else None) or "http://open-webui:8080/v1"
-        llm_api_key = decrypt_value(voice_config.llm_api_key) if voice_config and voice_config.llm_api_key else None
-        llm_model = (voice_config.llm_model if voice_config else None) or "gpt-3.5-turbo"
-        voice_id = (voice_config.voice_id if voice_config else None) or "default"
-        db_system_prompt = voice_config.system_prompt if voice_config else None
+        # Cached + pre-decrypted config (refreshed every few seconds, invalidated on config save)
+        vc = get_voice_config_cached()
+        llm_url = vc["llm_url"]
+        llm_api_key = vc["llm_api_key"]
+        llm_model = vc["llm_model"]
+        voice_id = vc["voice_id"]
+        db_system_prompt = vc["system_prompt"]
         
-        stt_timeout = voice_config.stt_timeout if voice_config and voice_config.stt_timeout else 10
-        tts_timeout = voice_config.tts_timeout if voice_config and voice_config.tts_timeout else 10
-        llm_timeout = voice_config.llm_timeout if voice_config and voice_config.llm_timeout else 10
+        stt_timeout = vc["stt_timeout"]
+        tts_timeout = vc["tts_timeout"]
+        llm_timeout = vc["llm_timeout"]
         
-        if voice_config and voice_config.stt_url: stt_url = voice_config.stt_url
-        if voice_config and voice_config.tts_url: tts_url = voice_config.tts_url
+        stt_url = vc["stt_url"]
+        tts_url = vc["tts_url"]
         
-        send_context = voice_config.send_conversation_context if voice_config else True
-        rtp_codec = (voice_config.rtp_codec if voice_config else None) or "PCMU"
+        send_context = vc["send_context"]
+        rtp_codec = vc["rtp_codec"]
         
-        print(f"[DEBUG] Loaded Timeouts from DB -> LLM: {llm_timeout}, TTS: {tts_timeout}, STT: {stt_timeout}")
+        print(f"[DEBUG] Loaded Timeouts from Config -> LLM: {llm_timeout}, TTS: {tts_timeout}, STT: {stt_timeout}")
+
+        # Resolve the hangup credentials now so ending the call doesn't wait on a DB query + decrypt
+        telnyx_api_key = get_provider_api_key_cached("telnyx")
         
         
     except Exception as e:
@@ -528,22 +818,23 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
         stt_timeout = 10
         tts_timeout = 10
         llm_timeout = 10
+        send_context = True
+        rtp_codec = "PCMU"
+        telnyx_api_key = None
         # stt_url/tts_url remain defaults
-    finally:
-        session.close()
 
     stt_client = ParakeetClient(base_url=stt_url)
     tts_client = ChatterboxClient(base_url=tts_url)
     
     # Initialize VAD buffer early for access in inner functions
-    inbound_buffer = bytearray()
+    inbound_buffer = PCMBuffer(MAX_UTTERANCE_BYTES) # reused for every utterance of the call
     
-    start_time = asyncio.get_event_loop().time()
+    start_time = time.monotonic()
     full_transcription = []
     conversation_history = []  # Maintain conversation state
     
     # Check for initial greeting (pre-generated)
-    ctx = CALL_CONTEXT.get(call_id, {})
+    ctx = map_data.context
     if ctx.get("initial_greeting"):
         greeting = ctx["initial_greeting"]
         print(f"[DEBUG] Found initial greeting for {call_id}: {greeting}")
@@ -556,35 +847,61 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
     
     is_bot_speaking = True
 
+    # Pre-serialized media envelope for locally generated frames (silence / padding).
+    # The payload is base64, so it can be spliced in without any JSON escaping.
+    media_prefix = '{"event": "media", "stream_id": ' + orjson.dumps(stream_id).decode() + ', "media": {"payload": "'
+    media_suffix = '"}}'
+
+    # Bounds parallel TTS requests for this call (see TTS_MAX_CONCURRENCY)
+    tts_sem = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+
+    # Pre-TTS warmup padding (100ms of silence) and the 20ms silence frame, serialized once per call
+    padding_frame = media_prefix + silence_payload(0.1, rtp_codec) + media_suffix
+    silence_media_frame = media_prefix + silence_payload(0.02, rtp_codec) + media_suffix
+
+    # L16 (16-bit, 8kHz) = 16000 bytes/sec, PCMU/PCMA (8-bit, 8kHz) = 8000 bytes/sec
+    audio_bytes_per_sec = 16000 if rtp_codec == "L16" else 8000
+
+    async def stream_preloaded(queue: Queue) -> int:
+        """
+        Sends preloaded greeting payloads from `queue` until the None (EOF) sentinel. Returns the number of frames sent.
+        Only blocks when the queue is empty; everything the producer has already buffered is drained without awaiting.
+        """
+        chunks_sent = 0
+        while True:
+            chunk = await queue.get()
+            batch = [chunk]
+            while chunk is not None and not queue.empty():
+                chunk = queue.get_nowait()
+                batch.append(chunk)
+
+            for chunk in batch:
+                if chunk is None:
+                    return chunks_sent
+
+                if chunks_sent == 0:
+                     print(f"[DEBUG] [Sender] First audio chunk retrieved from queue. Streaming started!")
+
+                await websocket.send_text(media_prefix + chunk + media_suffix)
+                chunks_sent += 1
+
     async def send_initial_sequence():
         nonlocal is_bot_speaking
         try:
             # 2a. Send Silence Burst
             print(f"[DEBUG] [Sender] Sending silence to establish audio path...")
-            for silence_chunk in generate_silence(duration_sec=0.5, codec=rtp_codec):
-                await websocket.send_text(json.dumps({
-                    "event": "media",
-                    "stream_id": stream_id,
-                    "media": {
-                        "payload": silence_chunk
-                    }
-                }))
-                await asyncio.sleep(0.02)
+            pacer = FramePacer()
+            for _ in range(SILENCE_BURST_FRAMES):
+                await websocket.send_text(silence_media_frame)
+                await pacer.wait(0.02)
 
             # 2b. Delay
             if delay_ms > 0:
                  print(f"[DEBUG] [Sender] Applying audio delay of {delay_ms}ms with continuous silence...")
                  num_silence_chunks = int(delay_ms / 20)
                  for _ in range(num_silence_chunks):
-                     for silence_chunk in generate_silence(duration_sec=0.02, codec=rtp_codec):
-                         await websocket.send_text(json.dumps({
-                             "event": "media",
-                             "stream_id": stream_id,
-                             "media": {
-                                 "payload": silence_chunk
-                             }
-                         }))
-                     await asyncio.sleep(0.02)
+                     await websocket.send_text(silence_media_frame)
+                     await pacer.wait(0.02)
 
             # 2c. Preloaded Audio
             # Poll for preloaded audio if this is an inbound call (initial_prompt is set)
@@ -598,8 +915,9 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
                  
                  found_queue = False
                  for i in range(polling_iter):
-                      if call_id in PRELOADED_STREAMS:
-                          queue = PRELOADED_STREAMS[call_id]
+                      # Taken out of the map: the queue is consumed exactly once
+                      queue = map_data.take_stream_queue()
+                      if queue is not None:
                           found_queue = True
                           break
                       if i % 20 == 0:
@@ -610,7 +928,6 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
                      print(f"[DEBUG] [Sender] Streaming from Queue for {call_id}...")
                      
                      # LATE BINDING: Check if greeting text is available now (race condition fix)
-                     ctx = CALL_CONTEXT.get(call_id, {})
                      if ctx.get("initial_greeting") and not any(m['role'] == 'assistant' for m in conversation_history):
                          greeting = ctx["initial_greeting"]
                          greeting = ctx["initial_greeting"];
@@ -619,52 +936,16 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
                          conversation_history.append({"role": "assistant", "content": greeting});
 
                      chunks_sent = 0
-                     while True:
-                         try:
-                             chunk = await queue.get()
-                             if chunk is None:
-                                 queue.task_done()
-                                 break
-                             
-                             if chunks_sent == 0:
-                                  print(f"[DEBUG] [Sender] First audio chunk retrieved from queue. Streaming started!")
-
-                             try:
-                                 chunk_obj = json.loads(chunk)
-                                 if stream_id and "stream_id" not in chunk_obj:
-                                     chunk_obj["stream_id"] = stream_id
-                                     chunk = json.dumps(chunk_obj)
-                             except: pass
-
-                             await websocket.send_text(chunk)
-                             chunks_sent += 1
-                             queue.task_done()
-                         except Exception as e:
-                             print(f"[ERROR] Stream consumption error: {e}")
-                             break
+                     try:
+                         chunks_sent = await stream_preloaded(queue)
+                     except Exception as e:
+                         print(f"[ERROR] Stream consumption error: {e}")
                      print(f"[DEBUG] [Sender] Stream finished. Sent {chunks_sent} chunks.")
                  else:
                      print(f"[WARN] [Sender] Stream Queue never appeared for {call_id}. Skipping.")
-            elif call_id in PRELOADED_STREAMS:
+            elif (queue := map_data.take_stream_queue()) is not None:
                  # Outbound case
-                 queue = PRELOADED_STREAMS[call_id]
-                 chunks_sent = 0
-                 while True:
-                     chunk = await queue.get()
-                     if chunk is None:
-                         queue.task_done()
-                         break
-                     
-                     try:
-                         chunk_obj = json.loads(chunk)
-                         if stream_id and "stream_id" not in chunk_obj:
-                             chunk_obj["stream_id"] = stream_id
-                             chunk = json.dumps(chunk_obj)
-                     except: pass
-                     
-                     await websocket.send_text(chunk)
-                     chunks_sent += 1
-                     queue.task_done()
+                 chunks_sent = await stream_preloaded(queue)
                  print(f"[DEBUG] [Sender] Outbound/Ready stream finished. Sent {chunks_sent} chunks.")
             
             # Wait for echo tail (increased for inbound latency)
@@ -682,11 +963,6 @@ async def websocket_endpoint(websocket: WebSocket, short_id: str, token: Optiona
             is_bot_speaking = False
             inbound_buffer.clear()
 
-    DEFAULT_SYSTEM_PROMPT = """
-You are a helpful AI assistant.
-"""
-    
-    # Construct final system prompt
     # Construct final system prompt
     # Merge Global System Prompt (Config) with Specific Call Prompt (API)
     if initial_prompt:
@@ -697,31 +973,17 @@ You are a helpful AI assistant.
     else:
         base_prompt = db_system_prompt if db_system_prompt and db_system_prompt.strip() else DEFAULT_SYSTEM_PROMPT
     
-    # Inject Context
-    context = CALL_CONTEXT.get(call_id, {})
+    # Built once per call and kept byte-identical on every turn (no per-call context inside it),
+    # so OpenAI-compatible backends can reuse their prompt-prefix cache.
+    final_system_prompt = base_prompt + SYSTEM_PROMPT_SUFFIX
+    prompt_prefix = [{"role": "system", "content": final_system_prompt}]
+
+    # Inject Context as a separate message after the cacheable prefix
+    context = map_data.context
     user_id = context.get("user_id")
     chat_id = context.get("chat_id")
     if user_id or chat_id:
-        base_prompt += f"\n\n[Context: user_id={user_id}, chat_id={chat_id}]"
-    
-    TOOL_INSTRUCTIONS = """
-You can control the call by outputting a JSON block at the very end of your response.
-Available Tools:
-- hangup: Ends the call. Use this when the user says goodbye or wants to stop.
-
-If you decide to hangup, you MUST generate a polite sign-off message (e.g., "Goodbye!", "Have a nice day!") before the JSON block in the "[Your spoken response here]" section.
-
-Format:
-[Your spoken response here]
-```json
-{
-  "action": "hangup",
-  "reason": "user said goodbye"
-}
-```
-IMPORTANT: Do NOT output any text after the JSON block. Do NOT read the JSON block aloud.
-"""
-    final_system_prompt = base_prompt + "\n" + TOOL_INSTRUCTIONS + "\n" + PARALINGUISTIC_INSTRUCTIONS
+        prompt_prefix.append({"role": "system", "content": f"[Context: user_id={user_id}, chat_id={chat_id}]"})
 
     async def process_conversation_turn(transcript):
          nonlocal is_bot_speaking
@@ -731,17 +993,18 @@ IMPORTANT: Do NOT output any text after the JSON block. Do NOT read the JSON blo
          try:
              full_transcription.append(f"User: {transcript}")
              
-             # Update History
+             # Update History (rolling window so prompt size stays bounded on long calls)
              conversation_history.append({"role": "user", "content": transcript})
+             if len(conversation_history) > MAX_HISTORY_MESSAGES:
+                 del conversation_history[:-MAX_HISTORY_MESSAGES]
              
              # Construct Messages
              if send_context:
                  # History + Current (History includes the current user turn now)
-                 messages_payload = [{"role": "system", "content": final_system_prompt}] + conversation_history
+                 messages_payload = prompt_prefix + conversation_history
              else:
                  # Stateless: System + Current User
-                 messages_payload = [
-                     {"role": "system", "content": final_system_prompt},
+                 messages_payload = prompt_prefix + [
                      {"role": "user", "content": transcript}
                  ]
              
@@ -754,106 +1017,176 @@ IMPORTANT: Do NOT output any text after the JSON block. Do NOT read the JSON blo
              headers = {"Authorization": f"Bearer {llm_api_key}"} if llm_api_key else {}
              
              try:
-                 import time
                  start_ts = time.time()
-                 llm_resp = requests.post(
+                 speaker_task = None
+
+                 # Speech state (shared with the speaker task below)
+                 total_sent_bytes = 0
+                 speech_start_time = None
+                 ws_closed = False
+                 sentence_queue = Queue()
+                 tts_tasks = []
+
+                 async def synth_sentence(sentence, out):
+                     """
+                     Synthesizes one sentence into `out` (base64 payloads, then None). Runs under tts_sem.
+                     """
+                     try:
+                         async with tts_sem:
+                             print(f"[DEBUG] [Turn] TTS Input (Sentence): '{sentence}'")
+                             tts_stream_gen = tts_client.speak_stream(sentence, voice_id=voice_id, timeout=tts_timeout)
+                             async for payload in process_tts_stream(tts_stream_gen, voice_id, codec=rtp_codec):
+                                 out.put_nowait(payload)
+                     except Exception as e:
+                         print(f"[ERROR] [Turn] TTS failed for sentence: {e}")
+                     finally:
+                         out.put_nowait(None)
+
+                 def queue_sentence(sentence):
+                     # Start synthesis right away; playback order is kept by sentence_queue
+                     out = Queue()
+                     tts_tasks.append(asyncio.create_task(synth_sentence(sentence, out)))
+                     sentence_queue.put_nowait(out)
+
+                 async def speak_sentences():
+                     """
+                     Plays the per-sentence frame queues from sentence_queue in order (None = end of turn).
+                     """
+                     nonlocal total_sent_bytes, speech_start_time, ws_closed
+                     padding_sent = False
+                     pacer = FramePacer()
+                     while True:
+                         frames = await sentence_queue.get()
+                         if frames is None:
+                             break
+
+                         if not padding_sent:
+                             # A. Send small silence padding to prevent cutoff (warmup)
+                             # Reduced to 100ms to minimize latency perception. One pre-built frame, no pacing:
+                             # it just sits in front of the first TTS frame in the provider's buffer.
+                             print(f"[DEBUG] [Turn] Sending pre-TTS silence padding...")
+                             await websocket.send_text(padding_frame)
+                             padding_sent = True
+
+                         while True:
+                             payload = await frames.get()
+                             if payload is None:
+                                 break
+                             if speech_start_time is None:
+                                 speech_start_time = time.monotonic()
+                             
+                             # Track audio duration for precise hangup (audio bytes from the base64 length, no decode)
+                             frame_bytes = b64_decoded_len(payload)
+                             total_sent_bytes += frame_bytes
+
+                             try:
+                                 await websocket.send_text(media_prefix + payload + media_suffix)
+                                 # Frames are coalesced, so pace by the real duration of this frame
+                                 await pacer.wait(frame_bytes / audio_bytes_per_sec if frame_bytes else 0.02)
+                             except RuntimeError as e:
+                                  if "WebSocket is not connected" in str(e):
+                                      print("[WARN] [Turn] WebSocket disconnected during TTS flush.")
+                                      ws_closed = True
+                                      return
+                                  raise e
+
+                 llm_ok = False
+                 full_response_buffer = ""
+                 pending_text = "" # Text not yet handed to TTS
+                 holding_tail = False # Set once a possible tool block starts; the rest is held until the end
+
+                 async with LLM_HTTP_CLIENT.stream(
+                     "POST",
                      f"{llm_url.rstrip('/')}/chat/completions",
                      json=chat_payload,
                      headers=headers,
                      timeout=llm_timeout,
-                     stream=True, 
-                 )
-                 latency = time.time() - start_ts
-                 print(f"[DEBUG] LLM Latency (Stream Start): {latency:.2f}s")
-                 
-                 if llm_resp.status_code == 200:
-                     print("LLM Stream Started... Buffering for tool check...")
-                     full_response_buffer = ""
-                     
-                     # 1. Accumulate FULL response first (to handle tools safely)
-                     for line in llm_resp.iter_lines():
-                         if line:
-                             decoded = line.decode('utf-8')
-                             if decoded.startswith("data: "):
-                                 content = decoded[6:]
-                                 if content == "[DONE]": break
-                                 try:
-                                     chunk_json = json.loads(content)
-                                     delta = chunk_json.get("choices", [{}])[0].get("delta", {}).get("content", "")
-                                     if delta:
-                                         full_response_buffer += delta
-                                 except: pass
-                                 
+                 ) as llm_resp:
+                     latency = time.time() - start_ts
+                     print(f"[DEBUG] LLM Latency (Stream Start): {latency:.2f}s")
+
+                     if llm_resp.status_code == 200:
+                         llm_ok = True
+                         print("LLM Stream Started... Speaking sentence by sentence...")
+                         speaker_task = asyncio.create_task(speak_sentences())
+
+                         # 1. Stream tokens; hand every completed sentence to TTS right away
+                         async for line in llm_resp.aiter_lines():
+                             if not line.startswith("data: "):
+                                 continue
+                             content = line[6:]
+                             if content == "[DONE]": break
+                             try:
+                                 delta = extract_delta_content(content)
+                             except: continue
+                             if not delta:
+                                 continue
+
+                             full_response_buffer += delta
+                             pending_text += delta
+                             if holding_tail:
+                                 continue
+
+                             # Never speak anything from a (possible) JSON tool block onwards
+                             speakable = pending_text
+                             tool_start = min((i for i in (pending_text.find("```"), pending_text.find("{")) if i >= 0), default=-1)
+                             if tool_start >= 0:
+                                 speakable = pending_text[:tool_start]
+                                 holding_tail = True
+
+                             consumed = 0
+                             for boundary in SENTENCE_END_RE.finditer(speakable):
+                                 sentence = speakable[consumed:boundary.end()].strip()
+                                 consumed = boundary.end()
+                                 if sentence:
+                                     queue_sentence(sentence)
+                             pending_text = pending_text[consumed:]
+                     else:
+                         await llm_resp.aread()
+                         print(f"LLM Error {llm_resp.status_code}: {llm_resp.text}")
+
+                 if llm_ok:
                      print(f"[DEBUG] [Turn] Full Buffer: {full_response_buffer[:100]}...")
 
                      # 2. Parse & Strip Command
                      should_hangup = False
                      final_text_to_speak = full_response_buffer
+                     tail_to_speak = pending_text
                      
-                     # Simple parsing for JSON block at end
-                     json_match = re.search(r'```json\s*(\{.*?\})\s*```', full_response_buffer, re.DOTALL)
-                     if not json_match:
+                     # Simple parsing for JSON block at end (regexes only run if the cheap checks pass)
+                     json_match = None
+                     if "```" in full_response_buffer:
+                          json_match = TOOL_JSON_FENCE_RE.search(full_response_buffer)
+                     if not json_match and full_response_buffer.rstrip().endswith("}"):
                           # Safer fallback: Look for JSON-like block at the END of string
-                          json_match = re.search(r'(\{[\s\S]*?\})\s*$', full_response_buffer)
+                          json_match = TOOL_JSON_TAIL_RE.search(full_response_buffer)
 
                      if json_match:
                          try:
                              command_str = json_match.group(1)
-                             command = json.loads(command_str)
+                             command = orjson.loads(command_str)
                              print(f"[DEBUG] [Turn] Parsed Command: {command}")
                              if command.get("action") == "hangup":
                                  should_hangup = True
                                  
                              # Remove the JSON from the spoken text (ALWAYS)
-                             final_text_to_speak = full_response_buffer.replace(json_match.group(0), "").strip()
-                             # Also try removing just the match group 1 if the fences were separate
-                             final_text_to_speak = final_text_to_speak.replace(command_str, "").strip()
+                             final_text_to_speak = (full_response_buffer[:json_match.start()] + full_response_buffer[json_match.end():]).strip()
+                             # The tool block is always inside the held-back tail (a suffix of the buffer)
+                             tail_offset = len(full_response_buffer) - len(tail_to_speak)
+                             if json_match.start() >= tail_offset:
+                                 tail_to_speak = tail_to_speak[:json_match.start() - tail_offset] + tail_to_speak[json_match.end() - tail_offset:]
+                             else:
+                                 tail_to_speak = tail_to_speak.replace(json_match.group(0), "")
                          except Exception as e:
                              print(f"[WARN] Failed to parse detected JSON: {e}")
 
-                     # 3. Speak Cleaned Text
-                     total_sent_bytes = 0
-                     speech_start_time = None
-                     if final_text_to_speak.strip():
-                          print(f"[DEBUG] [Turn] TTS Input (Cleaned): '{final_text_to_speak}'")
-                          
-                          # A. Send small silence padding to prevent cutoff (warmup)
-                          # Reduced to 100ms to minimize latency perception
-                          print(f"[DEBUG] [Turn] Sending pre-TTS silence padding...")
-                          for padding_chunk in generate_silence(duration_sec=0.1, codec=rtp_codec):
-                               await websocket.send_text(json.dumps({
-                                   "event": "media",
-                                   "stream_id": stream_id,
-                                   "media": {
-                                       "payload": padding_chunk
-                                   }
-                               }))
-                               await asyncio.sleep(0.01)
-
-                          tts_stream_gen = tts_client.speak_stream(final_text_to_speak, voice_id=voice_id, timeout=tts_timeout)
-                          async for msg_json in process_tts_stream(tts_stream_gen, voice_id, codec=rtp_codec):
-                              if speech_start_time is None:
-                                  speech_start_time = asyncio.get_event_loop().time()
-                              msg = json.loads(msg_json)
-                              if stream_id: msg["stream_id"] = stream_id
-                              
-                              # Track audio duration for precise hangup
-                              payload = msg.get("media", {}).get("payload")
-                              if payload:
-                                  try:
-                                      # PCMU is 1 byte per sample, 8000Hz
-                                      # Base64 string length -> approx bytes, or just decode
-                                      total_sent_bytes += len(base64.b64decode(payload))
-                                  except: pass
-
-                              try:
-                                  await websocket.send_text(json.dumps(msg))
-                                  await asyncio.sleep(0.02)
-                              except RuntimeError as e:
-                                   if "WebSocket is not connected" in str(e):
-                                       print("[WARN] [Turn] WebSocket disconnected during TTS flush.")
-                                       return
-                                   raise e
+                     # 3. Speak the remaining (cleaned) tail and wait for playback to finish
+                     if tail_to_speak.strip():
+                         queue_sentence(tail_to_speak.strip())
+                     sentence_queue.put_nowait(None)
+                     await speaker_task
+                     if ws_closed:
+                         return
                      
                      print(f"[DEBUG] [Turn] Response finished.")
                      
@@ -865,65 +1198,42 @@ IMPORTANT: Do NOT output any text after the JSON block. Do NOT read the JSON blo
                         # Add to full transcription for Call Log
                         full_transcription.append(f"Assistant: {final_text_to_speak}")
                      
+                     # Wait (WALL CLOCK) until the caller has heard everything we sent, plus a small buffer
+                     remaining = playback_remaining(total_sent_bytes, speech_start_time, audio_bytes_per_sec)
                      if should_hangup:
-                         # Calculate dynamic sleep time based on WALL CLOCK
-                         # L16 (16-bit, 8kHz) = 16000 bytes/sec
-                         # PCMU (8-bit, 8kHz) = 8000 bytes/sec
-                         bytes_per_sec = 16000 if rtp_codec == "L16" else 8000
-                         
-                         wait_time = 0.1 # Default small buffer (was 0.5)
-                         
-                         if total_sent_bytes > 0:
-                             speech_duration = total_sent_bytes / float(bytes_per_sec)
-                             
-                             if speech_start_time:
-                                 # Time elapsed since we STARTED speaking
-                                 elapsed = asyncio.get_event_loop().time() - speech_start_time
-                                 # We want to wait until start + duration
-                                 # Remaining wait = duration - elapsed
-                                 remaining = speech_duration - elapsed
-                                 
-                                 if remaining > 0:
-                                     wait_time = remaining + 0.1 # Small buffer
-                                     print(f"[DEBUG] [Turn] Duration: {speech_duration:.2f}s. Elapsed: {elapsed:.2f}s. Waiting remaining: {wait_time:.2f}s")
-                                 else:
-                                     wait_time = 0.1 # Just buffer
-                                     print(f"[DEBUG] [Turn] Duration: {speech_duration:.2f}s. Already elapsed: {elapsed:.2f}s. Just buffer.")
-                             else:
-                                  wait_time = speech_duration + 0.1
-                         
-                         await asyncio.sleep(wait_time)
+                         wait_time = remaining + 0.1
+                         print(f"[DEBUG] [Turn] Waiting {wait_time:.2f}s for playback before hangup...")
                      else:
-                         # Normal turn: Just wait a bit for echo tail / buffer drain
-                         print(f"[DEBUG] [Turn] Turn finished. Waiting 1.0s for echo tail...")
-                         await asyncio.sleep(1.0)
+                         # Normal turn: playback drain + echo tail before listening again
+                         wait_time = remaining + ECHO_TAIL_SEC
+                         print(f"[DEBUG] [Turn] Turn finished. Waiting {wait_time:.2f}s for echo tail...")
+                     await asyncio.sleep(wait_time)
 
                      if should_hangup:
                          print("[DEBUG] [Turn] Executing Hangup Action.")
                          
                          # Execute Telnyx Hangup via REST API
                          try:
-                             # We need the API key to hang up. 
-                             # For now, we'll re-query the provider config or use a strict default since we know it's likely Telnyx.
-                             # Optimization: In a real app, store api_key in STREAM_ID_MAP or pass it down.
-                             # Here we will query it.
-                             provider_config = session.exec(select(ProviderConfig).where(ProviderConfig.name == "telnyx")).first()
-                             if provider_config:
-                                 telnyx_provider = TelnyxProvider(api_key=decrypt_value(provider_config.api_key))
+                             # We need the API key to hang up. It was resolved (and decrypted) at call start.
+                             if telnyx_api_key:
+                                 telnyx_provider = TelnyxProvider(api_key=telnyx_api_key)
                                  # We need the call_control_id. It's usually the same as call_id logic, 
                                  # but let's assume call_id passed to this function IS the call_control_id (which it is for Telnyx).
-                                 telnyx_provider.hangup_call(call_id)
+                                 await telnyx_provider.hangup_call_async(call_id)
                          except Exception as hangup_e:
                              print(f"[ERROR] Failed to execute REST hangup: {hangup_e}")
 
                          await websocket.close()
                          return
-
-                 else:
-                     print(f"LLM Error {llm_resp.status_code}: {llm_resp.text}")
                          
              except Exception as llm_e:
                  print(f"LLM/TTS Error: {llm_e}")
+             finally:
+                 if speaker_task and not speaker_task.done():
+                     speaker_task.cancel()
+                 for t in tts_tasks:
+                     if not t.done():
+                         t.cancel()
                  
          except asyncio.CancelledError:
              print("[DEBUG] [Turn] Task cancelled.")
@@ -939,25 +1249,28 @@ IMPORTANT: Do NOT output any text after the JSON block. Do NOT read the JSON blo
     if stream_id:
         sender_task = asyncio.create_task(send_initial_sequence())
     
-    # Store background tasks to prevent garbage collection
+    # Store background tasks to prevent garbage collection (and to cancel them on hangup).
+    # At most one is running: the speaking gate is closed as a turn is spawned and reopens when it ends.
     turn_tasks = set()
 
-    turn_tasks = set()
-
-    # inbound_buffer = bytearray() # Moved to top scope
-    silence_timer = 0.0 # RMS-based VAD timer
+    # inbound_buffer = PCMBuffer() # Moved to top scope
+    silence_bytes = 0 # VAD silence run (bytes of PCM16 since the last speech frame)
     has_speech_activity = False
+    vad = create_vad() # WebRTC VAD (stateful, one per call) or the adaptive RMS gate (EnergyVAD)
     # BUFFER_THRESHOLD = 64000 # Deprecated in favor of VAD 
     
     # DEBUG_MODE check (module level or local?)
     # best to read from env here to save passing it down
     debug_mode = os.getenv("DEBUG", "false").lower() == "true"
 
+    # Inbound codec decoder, picked once for the whole call
+    decode_inbound = get_decoder(rtp_codec)
+
     # 3. Main Loop (Bidirectional Media)
     try:
         while True:
             data = await websocket.receive_text()
-            msg = json.loads(data)
+            msg = orjson.loads(data)
             event = msg.get("event")
             
             if event == "media":
@@ -967,80 +1280,59 @@ IMPORTANT: Do NOT output any text after the JSON block. Do NOT read the JSON blo
 
                 payload = msg.get("media", {}).get("payload") 
                 if payload:
-                    chunk_in = base64.b64decode(payload)
-                    
-                    if rtp_codec == "L16":
-                        # L16 is 16k BE (usually), but Telnyx PSTN seems to force 8k.
-                        # And we already found LE is preferred.
-                        # So we assume 8k LE input. No Swap. No Resample.
-                        chunk_pcm16 = chunk_in
-                    elif rtp_codec == "PCMA":
-                        chunk_pcm16 = audioop.ulaw2lin(chunk_in, 2) # Wait, this is alaw2lin!
-                        chunk_pcm16 = audioop.alaw2lin(chunk_in, 2)
-                    else:
-                        # PCMU
-                        chunk_pcm16 = audioop.ulaw2lin(chunk_in, 2)
+                    chunk_in = b64decode(payload)
+                    samples, chunk_pcm16 = decode_inbound(chunk_in)
                         
-                    inbound_buffer.extend(chunk_pcm16)
+                    inbound_buffer.append(chunk_pcm16)
                     
                     # VAD Logic
-                    # 1. Calculate Energy
-                    rms = audioop.rms(chunk_pcm16, 2)
-                    chunk_duration = len(chunk_pcm16) / 16000.0
-                    
-                    # 2. Update Silence Timer
+                    buffered = len(inbound_buffer)
                     
                     # DEBUG VAD (Conditional)
-                    if debug_mode and len(inbound_buffer) % 8000 < 200: 
-                       print(f"[VAD DEBUG] Buffer: {len(inbound_buffer)} bytes. Current RMS: {rms}. Silence Timer: {silence_timer:.2f}")
+                    if debug_mode and buffered % 8000 < 200: 
+                       print(f"[VAD DEBUG] Buffer: {buffered} bytes. Current RMS: {audio_rms(samples)}. Silence: {silence_bytes / PCM16_BYTES_PER_SEC:.2f}s")
                     
-                    if rms < 500:
-                        silence_timer += chunk_duration
+                    # 1. Update Silence Run (energy is only computed when the RMS gate is the detector)
+                    if not is_speech(vad, chunk_pcm16, samples):
+                        silence_bytes += len(chunk_pcm16)
                     else:
-                        silence_timer = 0.0
+                        silence_bytes = 0
                         has_speech_activity = True
-                        
-                    # Debug Print periodically
-                    # if silence_timer > 0.1:
-                    #    print(f"S({silence_timer:.1f})", end="", flush=True)
 
-                    # 3. Trigger Conditions
+                    # 2. Trigger Conditions
                     # A. Max Duration Reached (15s) - Failsafe
-                    # B. Silence Detected (> 1.2s) AND Minimum Speech Captured (> 0.5s)
-                    
-                    buffer_duration = len(inbound_buffer) / 16000.0
-                    
-                    should_process = False
-                    reason = ""
-                    
-                    if buffer_duration > 15.0:
-                         should_process = True
+                    # B. Silence Detected (> VAD_SILENCE_SEC) AND Minimum Speech Captured (> 0.5s)
+                    reason = None
+                    if buffered > MAX_UTTERANCE_BYTES:
                          reason = "max_duration"
-                    elif silence_timer > 1.2 and buffer_duration > 0.5:
-                         should_process = True
+                    elif silence_bytes > VAD_SILENCE_BYTES and buffered > MIN_UTTERANCE_BYTES:
                          reason = "silence_detected"
                          
-                    if should_process:
+                    if reason:
+                        buffer_duration = buffered / PCM16_BYTES_PER_SEC
                         if not has_speech_activity and reason == "silence_detected":
                              print(f"[DEBUG] Dropping silent buffer (Duration: {buffer_duration:.2f}s). RMS never exceeded threshold.")
                              inbound_buffer.clear()
-                             silence_timer = 0.0
+                             silence_bytes = 0
                              has_speech_activity = False
                         else:
-                            print(f"[DEBUG] Processing Audio ({reason}). Duration: {buffer_duration:.2f}s. Silence: {silence_timer:.2f}s. Last RMS: {rms}")
-                            wav_data = create_wav_header(bytes(inbound_buffer), sample_rate=8000)
+                            print(f"[DEBUG] Processing Audio ({reason}). Duration: {buffer_duration:.2f}s. Silence: {silence_bytes / PCM16_BYTES_PER_SEC:.2f}s. Last RMS: {audio_rms(samples)}")
                             try:
-                                transcript = stt_client.transcribe(wav_data, timeout=stt_timeout)
+                                transcript = await transcribe_utterance(stt_client, inbound_buffer, stt_timeout)
                                 print(f"[DEBUG] STT Raw Output: '{transcript}'") # Always log raw output
-                                if transcript and transcript.strip():
+                                normalized = normalize_transcript(transcript) if transcript else ""
+                                if normalized and normalized not in STT_IGNORE_PHRASES:
+                                    transcript = transcript.strip()
                                     print(f"User: {transcript}")
                                     
-                                    # Spawn background task for turn
+                                    # Spawn background task for turn. Close the speaking gate right away rather than when
+                                    # the task first runs, so media already queued behind the STT await can't start a second turn.
+                                    is_bot_speaking = True
                                     task = asyncio.create_task(process_conversation_turn(transcript))
                                     turn_tasks.add(task)
                                     task.add_done_callback(turn_tasks.discard)
                                 else:
-                                    print("[DEBUG] STT returned empty/silence.")
+                                    print("[DEBUG] STT returned empty/silence (or an ignored phrase).")
     
                                     
                             except Exception as e:
@@ -1048,7 +1340,7 @@ IMPORTANT: Do NOT output any text after the JSON block. Do NOT read the JSON blo
                             
                             # Reset
                             inbound_buffer.clear()
-                            silence_timer = 0.0
+                            silence_bytes = 0
                             has_speech_activity = False
             elif event == "stop":
                 print("Media stream stopped")
@@ -1065,17 +1357,17 @@ IMPORTANT: Do NOT output any text after the JSON block. Do NOT read the JSON blo
              print(f"[ERROR] WebSocket RuntimeError for {call_id}: {e}")
     except Exception as e:
         print(f"WebSocket error for {call_id}: {e}") # Log the error
-        import traceback
         traceback.print_exc() # Print traceback for detailed error info
     finally:
         if sender_task:
-            sender_task.cancel()
-            try:
-                await sender_task
-            except asyncio.CancelledError:
-                pass
-            except Exception as e:
-                print(f"[ERROR] Sender task error: {e}")
+            sender_task.cancel("call ended")
+            # Bounded wait: a send stuck on a dead socket must not hold up teardown (closing the socket ends it)
+            await asyncio.wait({sender_task}, timeout=SENDER_DRAIN_SEC)
+            if not sender_task.done():
+                BACKGROUND_TASKS.add(sender_task)
+                sender_task.add_done_callback(BACKGROUND_TASKS.discard)
+            elif not sender_task.cancelled() and sender_task.exception():
+                print(f"[ERROR] Sender task error: {sender_task.exception()}")
 
         if monitor_task:
              monitor_task.cancel()
@@ -1091,111 +1383,145 @@ IMPORTANT: Do NOT output any text after the JSON block. Do NOT read the JSON blo
         except:
             pass
             
-        # Update Call Log in DB
+        # Update Call Log in DB (+ inbound alerting) in a worker thread; the handler returns right away
+        if not db_id:
+            if map_data.db_insert is not None:
+                await map_data.db_insert # Inbound rows are inserted alongside the answer; a short call can end first
+            db_id = map_data.db_id
+
+        # The call is over: drop its per-call state so long-running processes don't accumulate it
+        STREAM_ID_MAP.pop(short_id, None)
         if db_id or call_id:
-            print(f"[DEBUG] Attempting to update CallLog (DB: {db_id}, Control: {call_id})...")
-            try:
-                end_time = asyncio.get_event_loop().time()
-                duration = int(end_time - start_time)
+            duration = int(time.monotonic() - start_time)
+            asyncio.get_running_loop().run_in_executor(
+                CALL_FINALIZE_POOL, finalize_call, db_id, call_id, duration, "\n".join(full_transcription)
+            )
+
+
+def finalize_call(db_id: Optional[int], call_id: Optional[str], duration: int, transcription: str):
+    """
+    Marks the CallLog as completed and, for inbound calls, sends the OpenWebUI alert.
+    Blocking (DB + REST); run it off the event loop.
+    """
+    print(f"[DEBUG] Attempting to update CallLog (DB: {db_id}, Control: {call_id})...")
+    alert = None
+    try:
+        with Session(engine) as db_session:
+            call_log = None
+            if db_id:
+                call_log = db_session.get(CallLog, db_id)
+            elif call_id:
+                # Fallback
+                statement = select(CallLog).where(CallLog.call_control_id == call_id).order_by(CallLog.id.desc())
+                call_log = db_session.exec(statement).first()
+            
+            if call_log:
+                call_log.status = "completed"
+                call_log.duration_seconds = duration
+                call_log.transcription = transcription
+                call_log.cost = (duration / 60) * 0.005 
+                db_session.add(call_log)
+                db_session.commit()
+                print(f"[SUCCESS] Updated CallLog {call_log.id}: duration={duration}s, status=completed")
+
+                if call_log.direction == "inbound" and call_log.user_id:
+                    alert = {
+                        "user_id": call_log.user_id,
+                        "from_number": call_log.from_number,
+                        "to_number": call_log.to_number,
+                        "duration_seconds": call_log.duration_seconds,
+                        "status": call_log.status,
+                        "transcription": call_log.transcription,
+                    }
+            else:
+                print(f"[WARN] CallLog not found for DB ID {db_id} or Control ID {call_id}")
+    except Exception as e:
+        print(f"[ERROR] Failed to update CallLog: {e}")
+
+    # --- Inbound Call Alerting ---
+    if alert:
+        send_inbound_call_alert(alert)
+
+
+# In-process cache of OpenWebUI alert channels: (user_id, channel_name) -> channel_id.
+# Backed by the UserChannel table, this just skips the DB lookup on repeat alerts.
+_CHANNEL_CACHE: dict = {}
+_CHANNEL_CACHE_LOCK = threading.Lock()
+
+def send_inbound_call_alert(alert: dict):
+    """
+    Posts the end-of-call summary of an inbound call to the user's OpenWebUI alert channel.
+    """
+    try:
+        # 1. Get Configs
+        with Session(engine) as db_session:
+            voice_conf = get_voice_config_row(db_session)
+        
+            if voice_conf and voice_conf.open_webui_admin_token:
+                token = decrypt_value(voice_conf.open_webui_admin_token) if voice_conf.open_webui_admin_token else None
+                # Derive the Open WebUI base URL from llm_url ('http://open-webui:8080/v1' -> 'http://open-webui:8080')
+                base_url = "http://open-webui:8080" # Default internal docker
+                if voice_conf.llm_url and "/v1" in voice_conf.llm_url:
+                     possible_base = voice_conf.llm_url.split("/v1")[0].split("/api")[0]
+                     if possible_base: base_url = possible_base
+            
+                # 2. Key: (user_id, channel_name)
+                channel_name = getattr(voice_conf, "alert_channel_name", "LLM-Communications-Gateway Alerts")
+                cache_key = (alert["user_id"], channel_name)
+            
+                # Check Cache (memory first, then DB)
+                with _CHANNEL_CACHE_LOCK:
+                    target_channel_id = _CHANNEL_CACHE.get(cache_key)
+
+                if not target_channel_id:
+                    user_chan = db_session.exec(select(UserChannel).where(
+                        UserChannel.user_id == alert["user_id"],
+                        UserChannel.channel_name == channel_name
+                    )).first()
                 
-                session_gen = get_session()
-                db_session = next(session_gen)
-                try:
-                    call_log = None
-                    if db_id:
-                        call_log = db_session.get(CallLog, db_id)
-                    elif call_id:
-                        # Fallback
-                        statement = select(CallLog).where(CallLog.call_control_id == call_id).order_by(CallLog.id.desc())
-                        call_log = db_session.exec(statement).first()
-                    
-                    if call_log:
-                        call_log.status = "completed"
-                        call_log.duration_seconds = duration
-                        call_log.transcription = "\n".join(full_transcription)
-                        call_log.cost = (duration / 60) * 0.005 
-                        db_session.add(call_log)
-                        db_session.commit()
-                        print(f"[SUCCESS] Updated CallLog {call_log.id}: duration={duration}s, status=completed")
+                    if user_chan:
+                        target_channel_id = user_chan.channel_id
+                        # Verify existence? No, trust cache for speed. Fail soft.
                     else:
-                        print(f"[WARN] CallLog not found for DB ID {db_id} or Control ID {call_id}")
-                finally:
-                    db_session.close()
-            except Exception as e:
-                print(f"[ERROR] Failed to update CallLog: {e}")
-
-            # --- Inbound Call Alerting ---
-            if call_log and call_log.direction == "inbound" and call_log.user_id:
-                try:
-                    # 1. Get Configs
-                    session_gen = get_session()
-                    db_session = next(session_gen)
-                    voice_conf = db_session.exec(select(VoiceConfig)).first()
-                    
-                    if voice_conf and voice_conf.open_webui_admin_token:
-                        token = decrypt_value(voice_conf.open_webui_admin_token) if voice_conf.open_webui_admin_token else None
-                        # Use LLM URL base if it looks like openwebui, or fallback to a guess?
-                        # Actually we need the 'Base URL' of Open WebUI.
-                        # If llm_url is 'http://open-webui:8080/v1', base is 'http://open-webui:8080'
-                        # But more robustly, we might want a specific setting.
-                        # For now, let's derive it from llm_url if llm_provider is openwebui, OR assume it matches if custom.
-                        # Or checking 'open_webui_url' env default?
-                        # Let's try to derive from llm_url first.
-                        base_url = "http://open-webui:8080" # Default internal docker
-                        if voice_conf.llm_url and "/v1" in voice_conf.llm_url:
-                             possible_base = voice_conf.llm_url.split("/v1")[0].split("/api")[0]
-                             if possible_base: base_url = possible_base
-                        
-                        # 2. Key: (user_id, channel_name)
-                        channel_name = getattr(voice_conf, "alert_channel_name", "LLM-Communications-Gateway Alerts")
-                        
-                        # Check Cache
-                        user_chan = db_session.exec(select(UserChannel).where(
-                            UserChannel.user_id == call_log.user_id,
-                            UserChannel.channel_name == channel_name
-                        )).first()
-                        
-                        target_channel_id = None
-                        if user_chan:
-                            target_channel_id = user_chan.channel_id
-                            # Verify existence? No, trust cache for speed. Fail soft.
+                        # 3. Lookup or Create
+                        print(f"[DEBUG] Alerting: Searching/Creating channel '{channel_name}' for user {alert['user_id']}...")
+                        found_id = openwebui.find_channel_by_user(base_url, token, alert["user_id"], channel_name)
+                        if found_id:
+                            target_channel_id = found_id
                         else:
-                            # 3. Lookup or Create
-                            print(f"[DEBUG] Alerting: Searching/Creating channel '{channel_name}' for user {call_log.user_id}...")
-                            found_id = openwebui.find_channel_by_user(base_url, token, call_log.user_id, channel_name)
-                            if found_id:
-                                target_channel_id = found_id
-                            else:
-                                created_id = openwebui.create_alert_channel(base_url, token, call_log.user_id, channel_name)
-                                if created_id:
-                                    target_channel_id = created_id
-                            
-                            # Cache it
-                            if target_channel_id:
-                                new_map = UserChannel(user_id=call_log.user_id, channel_name=channel_name, channel_id=target_channel_id)
-                                db_session.add(new_map)
-                                db_session.commit()
-                        
-                        # 4. Send Alert
+                            created_id = openwebui.create_alert_channel(base_url, token, alert["user_id"], channel_name)
+                            if created_id:
+                                target_channel_id = created_id
+                    
+                        # Cache it
                         if target_channel_id:
-                            msg = f"**Inbound Call Alert**\n\n" \
-                                  f"**From:** {call_log.from_number}\n" \
-                                  f"**To:** {call_log.to_number}\n" \
-                                  f"**Duration:** {call_log.duration_seconds}s\n" \
-                                  f"**Status:** {call_log.status}\n\n" \
-                                  f"**Transcription:**\n{call_log.transcription or '(No transcription available)'}"
-                            
-                            success = openwebui.send_alert(base_url, token, target_channel_id, msg)
-                            if success:
-                                print(f"[SUCCESS] Alert sent to OpenWebUI channel {target_channel_id}")
-                            else:
-                                print(f"[WARN] Failed to send alert to channel {target_channel_id}")
-                        else:
-                            print(f"[WARN] Could not find or create alert channel for user {call_log.user_id}")
-                            
-                    db_session.close()
-                except Exception as e:
-                     print(f"[ERROR] Alerting logic failed: {e}")
+                            new_map = UserChannel(user_id=alert["user_id"], channel_name=channel_name, channel_id=target_channel_id)
+                            db_session.add(new_map)
+                            db_session.commit()
+
+                    if target_channel_id:
+                        with _CHANNEL_CACHE_LOCK:
+                            _CHANNEL_CACHE[cache_key] = target_channel_id
+            
+                # 4. Send Alert
+                if target_channel_id:
+                    msg = f"**Inbound Call Alert**\n\n" \
+                          f"**From:** {alert['from_number']}\n" \
+                          f"**To:** {alert['to_number']}\n" \
+                          f"**Duration:** {alert['duration_seconds']}s\n" \
+                          f"**Status:** {alert['status']}\n\n" \
+                          f"**Transcription:**\n{alert['transcription'] or '(No transcription available)'}"
+                
+                    success = openwebui.send_alert(base_url, token, target_channel_id, msg)
+                    if success:
+                        print(f"[SUCCESS] Alert sent to OpenWebUI channel {target_channel_id}")
+                    else:
+                        print(f"[WARN] Failed to send alert to channel {target_channel_id}")
+                else:
+                    print(f"[WARN] Could not find or create alert channel for user {alert['user_id']}")
+
+    except Exception as e:
+         print(f"[ERROR] Alerting logic failed: {e}")
 
 
 @router.post("/voice/call")
@@ -1226,7 +1552,7 @@ async def initiate_call(request: CallRequest, fastapi_req: Request, background_t
 
     # FORCE FALLBACK for local IPs
     # This prevents sending reachable LAN IPs to Telnyx, which causes silent failures
-    if base_url and ("192.168" in base_url or "localhost" in base_url or "127.0.0.1" in base_url):
+    if base_url and LOCAL_URL_RE.search(base_url):
          print(f"Detected local base_url '{base_url}'. Forcing callback to public tunnel.")
          base_url = "https://telnyx-webhooks.sandoval.io"
 
@@ -1235,17 +1561,8 @@ async def initiate_call(request: CallRequest, fastapi_req: Request, background_t
     webhook_secret = provider_config.webhook_secret
     
     if base_url and webhook_secret:
-         import uuid
-         short_id = uuid.uuid4().hex
-         base_clean = base_url.replace("http://", "").replace("https://", "")
-         
-         # Robust WSS detection: Default to WSS if https in base_url, X-Forwarded-Proto is https, 
-         # or if the domain looks like a public tunnel (typically HTTPS).
-         is_secure = "https" in base_url or (scheme and "https" in str(scheme).lower())
-         if "ngrok" in base_clean or "sandoval.io" in base_clean or "loca.lt" in base_clean:
-             is_secure = True
-             
-         protocol = "wss" if is_secure else "ws"
+         short_id = secrets.token_hex(8) # 64-bit ephemeral stream id
+         base_clean, protocol = stream_url_origin(base_url, scheme)
          stream_url = f"{protocol}://{base_clean}/api/voice/stream/{short_id}?token={webhook_secret}"
          if request.delay_ms and request.delay_ms > 0:
              stream_url += f"&delay_ms={request.delay_ms}"
@@ -1257,27 +1574,32 @@ async def initiate_call(request: CallRequest, fastapi_req: Request, background_t
     vc_data = {}
     
     if request.prompt:
-         voice_config = session.exec(select(VoiceConfig)).first()
-         vc_data = {
-           "llm_url": (voice_config.llm_url if voice_config else None) or "http://open-webui:8080/v1",
-           "llm_api_key": decrypt_value(voice_config.llm_api_key) if voice_config and voice_config.llm_api_key else None,
-           "llm_model": (voice_config.llm_model if voice_config else None) or "gpt-3.5-turbo",
-           "voice_id": (voice_config.voice_id if voice_config else None) or "default",
-           "llm_timeout": getattr(voice_config, "llm_timeout", 10),
-           "tts_timeout": getattr(voice_config, "tts_timeout", 10),
-           "tts_url": (voice_config.tts_url if voice_config else None) or "http://chatterbox:8000",
-           "system_prompt": getattr(voice_config, "system_prompt", None),
-           "rtp_codec": getattr(voice_config, "rtp_codec", "PCMU") or "PCMU"
-         }
+         # Cached, pre-decrypted VoiceConfig (no SELECT / decrypt per call)
+         vc_data = dict(get_voice_config_cached())
          # Create Queue immediately
          stream_queue = Queue()
 
-    provider = TelnyxProvider(api_key=decrypt_value(provider_config.api_key))
+    provider = TelnyxProvider(api_key=get_provider_api_key_cached(provider_config.name))
     from_num = request.from_number or provider_config.from_number or "+15555555555"
 
+    # Start LLM + TTS for the greeting now, so it overlaps with placing the call.
+    # The greeting lands in greeting_context, which becomes the call's StreamMapping.context once the call id is known.
+    gen_task = None
+    greeting_context = {}
+    if stream_queue:
+        gen_task = asyncio.create_task(generate_initial_audio(request.prompt, vc_data, stream_queue, context=greeting_context))
+        BACKGROUND_TASKS.add(gen_task)
+        gen_task.add_done_callback(BACKGROUND_TASKS.discard)
+
+    # Hand the pooled DB connection back before the Telnyx round trip (provider_config's columns are already loaded).
+    # The session starts a new transaction for the CallLog insert below.
+    session.close()
+
     # Pass stream_url to make_call
-    rtp_codec = getattr(voice_config, "rtp_codec", "PCMU") or "PCMU" if request.prompt else "PCMU"
-    result = provider.make_call(request.to_number, from_num, connection_id, stream_url=stream_url, codec=rtp_codec)
+    rtp_codec = vc_data["rtp_codec"] if request.prompt else "PCMU"
+    result = await provider.make_call_async(request.to_number, from_num, connection_id, stream_url=stream_url, codec=rtp_codec)
+    if gen_task and not (result['success'] and result.get('call_id')):
+        gen_task.cancel()
     
     call_log = CallLog(
         to_number=request.to_number,
@@ -1289,8 +1611,9 @@ async def initiate_call(request: CallRequest, fastapi_req: Request, background_t
         direction="outbound"
     )
     session.add(call_log)
+    session.flush() # INSERT assigns the PK; read it before commit expires the row (no refresh SELECT)
+    db_id = call_log.id
     session.commit()
-    session.refresh(call_log)
     
     if not result['success']:
         raise HTTPException(status_code=500, detail=result.get('error'))
@@ -1299,36 +1622,40 @@ async def initiate_call(request: CallRequest, fastapi_req: Request, background_t
     if result.get('call_id'):
         call_id = result.get('call_id')
         if short_id:
-             STREAM_ID_MAP[short_id] = {
-                 "call_id": call_id,
-                 "db_id": call_log.id,
-                 "prompt": request.prompt,
-                 "max_duration": provider_config.max_call_duration or 600,
-                 "limit_message": provider_config.call_limit_message or "This call has reached its time limit. Goodbye."
-             }
-             print(f"Mapped {short_id} -> {call_id} (DB: {call_log.id})")
-             
-             # Store Context
-             if request.user_id or request.chat_id:
-                 if call_id not in CALL_CONTEXT:
-                      CALL_CONTEXT[call_id] = {}
-                 
-                 if request.user_id: CALL_CONTEXT[call_id]["user_id"] = request.user_id
-                 if request.chat_id: CALL_CONTEXT[call_id]["chat_id"] = request.chat_id
+             # Store Context (the greeting task may already have written initial_greeting into it)
+             if request.user_id: greeting_context["user_id"] = request.user_id
+             if request.chat_id: greeting_context["chat_id"] = request.chat_id
+
+             # One entry holds the mapping, the context and the preloaded queue (generation is already running)
+             STREAM_ID_MAP[short_id] = StreamMapping(
+                 call_id=call_id,
+                 db_id=db_id,
+                 prompt=request.prompt,
+                 max_duration=provider_config.max_call_duration or 600,
+                 limit_message=provider_config.call_limit_message or DEFAULT_LIMIT_MESSAGE,
+                 context=greeting_context,
+                 stream_queue=stream_queue
+             )
+             print(f"Mapped {short_id} -> {call_id} (DB: {db_id}, preloaded stream: {stream_queue is not None})")
 
-        if stream_queue:
-            # Register Queue for consumption
-            PRELOADED_STREAMS[call_id] = stream_queue
-            print(f"Registered PRELOADED_STREAMS queue for {call_id}")
-            
-            # Start Background Generation
-            # We must wrap it to ensure it runs
-            async def background_gen(p, v, q, c):
-                await generate_initial_audio(p, v, q, c)
-            
-            background_tasks.add_task(background_gen, request.prompt, vc_data, stream_queue, call_id)
+    return {"status": "initiated", "call_id": result.get('call_id'), "db_id": db_id}
 
-    return {"status": "initiated", "call_id": result.get('call_id'), "db_id": call_log.id}
+def persist_call_log(call_log: CallLog, short_id: Optional[str] = None):
+    """
+    Inserts a CallLog and records its id in STREAM_ID_MAP[short_id].
+    Blocking; the inbound webhook runs it in a worker thread and the stream awaits it before finalizing.
+    """
+    try:
+        with Session(engine) as db_session:
+            db_session.add(call_log)
+            db_session.flush()
+            db_id = call_log.id
+            db_session.commit()
+        map_data = STREAM_ID_MAP.get(short_id) if short_id else None
+        if map_data:
+            map_data.db_id = db_id
+    except Exception as e:
+        print(f"[ERROR] Failed to insert CallLog for {call_log.call_control_id}: {e}")
 
 @router.post("/voice/webhook")
 async def webhook_handler(request: dict, token: str, raw_request: Request, background_tasks: BackgroundTasks, session: Session = Depends(get_session)):
@@ -1336,8 +1663,8 @@ async def webhook_handler(request: dict, token: str, raw_request: Request, backg
     Handle inbound webhooks from Telnyx.
     Requires 'token' query parameter matching a valid ProviderConfig.webhook_secret.
     """
-    # Check if any provider has this token
-    provider = session.exec(select(ProviderConfig).where(ProviderConfig.webhook_secret == token)).first()
+    # Check if any provider has this token (cached: several webhooks arrive per call)
+    provider = get_provider_by_webhook_token(token)
     if not provider:
         print(f"Unauthorized webhook attempt. Token: {token}")
         raise HTTPException(status_code=403, detail="Unauthorized")
@@ -1370,16 +1697,11 @@ async def webhook_handler(request: dict, token: str, raw_request: Request, backg
                  base_url = f"{scheme}://{host}"
              
              # FORCE FALLBACK for local IPs
-             if base_url and ("192.168" in base_url or "localhost" in base_url or "127.0.0.1" in base_url):
+             if base_url and LOCAL_URL_RE.search(base_url):
                   base_url = "https://telnyx-webhooks.sandoval.io" 
              
-             import uuid
-             short_id = uuid.uuid4().hex
-             base_clean = base_url.replace("http://", "").replace("https://", "")
-             is_secure = "https" in base_url or (scheme and "https" in str(scheme).lower())
-             if "ngrok" in base_clean or "sandoval.io" in base_clean or "loca.lt" in base_clean:
-                 is_secure = True
-             protocol = "wss" if is_secure else "ws"
+             short_id = secrets.token_hex(8) # 64-bit ephemeral stream id
+             base_clean, protocol = stream_url_origin(base_url, scheme)
              stream_url = f"{protocol}://{base_clean}/api/voice/stream/{short_id}?token={token}"
              
              print(f"[DEBUG] Generated Stream URL for Inbound: {stream_url}")
@@ -1387,80 +1709,58 @@ async def webhook_handler(request: dict, token: str, raw_request: Request, backg
              # Inject Inbound System Prompt
              inbound_prompt = provider.inbound_system_prompt
              
-             # Inject Inbound System Prompt
-             inbound_prompt = provider.inbound_system_prompt
+             # Store Context Map (Before Answer); db_id is filled in once the CallLog insert below finishes
+             mapping = StreamMapping(
+                 call_id=call_control_id,
+                 prompt=inbound_prompt,
+                 max_duration=provider.max_call_duration or 600,
+                 limit_message=provider.call_limit_message or DEFAULT_LIMIT_MESSAGE
+             )
+             if provider.assigned_user_id:
+                 mapping.context["user_id"] = provider.assigned_user_id
+             STREAM_ID_MAP[short_id] = mapping
              
-             # MOVED STREAM_ID_MAP population to after CallLog creation to capture DB ID
+             # Log it: the INSERT runs in a worker thread while the call is answered, and the stream
+             # awaits it before finalizing, so the row exists even if the call ends right away
+             call_log = CallLog(
+                to_number=payload.get("to", "unknown"),
+                from_number=payload.get("from", "unknown"),
+                status="ringing",
+                call_control_id=call_control_id,
+                direction="inbound",
+                user_id=provider.assigned_user_id, # Auto-assign from Provider Config
+                user_label=provider.assigned_user_label # Auto-assign label
+             )
+             mapping.db_insert = asyncio.get_running_loop().run_in_executor(None, persist_call_log, call_log, short_id)
              
-             # Fetch VoiceConfig for Codec AND for LLM Preloading
+             # Fetch VoiceConfig for Codec AND for LLM Preloading (cached, pre-decrypted)
              codec = "PCMU"
-             voice_config = None
+             vc = None
              try:
-                 voice_config = session.exec(select(VoiceConfig)).first()
-                 if voice_config:
-                     codec = getattr(voice_config, "rtp_codec", "PCMU") or "PCMU"
-             except: pass
+                 vc = get_voice_config_cached()
+                 codec = vc["rtp_codec"]
+             except Exception as e:
+                 print(f"[WARN] VoiceConfig fetch failed, answering with {codec}: {e}")
 
              # Trigger Background LLM Generation for Greeting
              if inbound_prompt:
                  print(f"[DEBUG] Scheduling Inbound Greeting Generation for {call_control_id}")
                  
-                 # Construct Voice Config Data (copied from initiate_call logic)
-                 vc_data = {
-                   "llm_url": (voice_config.llm_url if voice_config else None) or "http://open-webui:8080/v1",
-                   "llm_api_key": decrypt_value(voice_config.llm_api_key) if voice_config and voice_config.llm_api_key else None,
-                   "llm_model": (voice_config.llm_model if voice_config else None) or "gpt-3.5-turbo",
-                   "voice_id": (voice_config.voice_id if voice_config else None) or "default",
-                   "llm_timeout": getattr(voice_config, "llm_timeout", 10),
-                   "tts_timeout": getattr(voice_config, "tts_timeout", 10),
-                   "tts_url": (voice_config.tts_url if voice_config else None) or "http://chatterbox:8000",
-                   "system_prompt": inbound_prompt, # Use Provider Intent as System Prompt
-                   "rtp_codec": codec
-                 }
+                 # Voice Config Data, with the Provider Intent as System Prompt
+                 vc_data = dict(VOICE_CONFIG_DEFAULTS, **(vc or {}), system_prompt=inbound_prompt, rtp_codec=codec)
                  # Use "Introduce yourself" as the trigger for the bot to speak first
-                 background_tasks.add_task(preload_inbound_audio, call_control_id, inbound_prompt, vc_data)
-
+                 background_tasks.add_task(preload_inbound_audio, mapping, inbound_prompt, vc_data)
 
 
-             from ..providers.telnyx import TelnyxProvider
-             telnyx_provider = TelnyxProvider(api_key=decrypt_value(provider.api_key))
+             telnyx_provider = TelnyxProvider(api_key=get_provider_api_key_cached(provider.name))
              # Answer WITH Stream Params (RTP + Codec + URL)
-             resp = telnyx_provider.answer_call(
+             resp = await telnyx_provider.answer_call_async(
                  call_control_id, 
                  stream_url=stream_url,
                  mode="rtp",
                  codec=codec
              )
              
-             # 2. Log it
-             call_log = CallLog(
-                to_number=payload.get("to", "unknown"),
-                from_number=payload.get("from", "unknown"),
-                status="ringing",
-                call_control_id=call_control_id,
-                direction="inbound",
-                user_id=provider.assigned_user_id, # Auto-assign from Provider Config
-                user_label=provider.assigned_user_label # Auto-assign label
-             )
-             session.add(call_log)
-             session.commit()
-             session.refresh(call_log)
-
-             # Store Context Map (Before Answer)
-             STREAM_ID_MAP[short_id] = {
-                 "call_id": call_control_id,
-                 "db_id": call_log.id,
-                 "prompt": inbound_prompt,
-                 "max_duration": provider.max_call_duration or 600,
-                 "limit_message": provider.call_limit_message or "This call has reached its time limit. Goodbye."
-             }
-
-             # Store Context
-             if provider.assigned_user_id:
-                 CALL_CONTEXT[call_control_id] = {
-                     "user_id": provider.assigned_user_id
-                 }
-             
              if not resp.get("success"):
                  print(f"[ERROR] Failed to answer inbound call: {resp.get('error')}")
 
@@ -1478,7 +1778,7 @@ async def webhook_handler(request: dict, token: str, raw_request: Request, backg
              call_log = session.exec(select(CallLog).where(CallLog.call_control_id == call_control_id)).first()
              
              if call_log and call_log.user_id and not call_log.user_label:
-                 voice_conf = session.exec(select(VoiceConfig)).first()
+                 voice_conf = get_voice_config_row(session)
                  if voice_conf and voice_conf.open_webui_admin_token:
                      token = decrypt_value(voice_conf.open_webui_admin_token)
                      
@@ -1522,7 +1822,7 @@ async def webhook_handler(request: dict, token: str, raw_request: Request, backg
         
         # 2. Send Alert to OpenWebUI
         try:
-             voice_config = session.exec(select(VoiceConfig)).first()
+             voice_config = get_voice_config_row(session)
              if voice_config and voice_config.open_webui_admin_token and provider.assigned_user_id:
                  token = decrypt_value(voice_config.open_webui_admin_token)
                  
@@ -1559,7 +1859,6 @@ async def webhook_handler(request: dict, token: str, raw_request: Request, backg
                      print(f"[WARN] Failed to find or create alert channel for user {provider.assigned_user_id}")
         except Exception as e:
             print(f"[ERROR] Failed to send SMS alert: {e}")
-            import traceback
             traceback.print_exc()
 
         return {"status": "received"}
@@ -1578,11 +1877,7 @@ def sync_provider_app(request: SyncRequest, session: Session = Depends(get_sessi
     
     if not provider_config.webhook_secret:
         # Should have been seeded, but generate if missing
-        import uuid
         provider_config.webhook_secret = uuid.uuid4().hex
-        session.add(provider_config)
-        session.commit()
-        session.refresh(provider_config)
         
     secret = provider_config.webhook_secret
     
@@ -1590,14 +1885,16 @@ def sync_provider_app(request: SyncRequest, session: Session = Depends(get_sessi
     base = request.base_url.rstrip('/')
     full_url = f"{base}/api/voice/webhook?token={secret}"
     
-    # Save base_url
+    # Save base_url (and a newly generated secret) in one commit
     provider_config.base_url = base
+    api_key, app_id = provider_config.api_key, provider_config.app_id # read before commit expires the row
     session.add(provider_config)
     session.commit()
+    invalidate_provider_config()
     
     if request.provider == 'telnyx':
-        provider = TelnyxProvider(api_key=decrypt_value(provider_config.api_key))
-        result = provider.update_app(provider_config.app_id, full_url)
+        provider = TelnyxProvider(api_key=decrypt_value(api_key))
+        result = provider.update_app(app_id, full_url)
         if not result['success']:
             raise HTTPException(status_code=500, detail=result.get('error'))
         return {"status": "synced", "url": full_url}
@@ -1623,7 +1920,6 @@ def create_messaging_profile(request: CreateAppRequest, session: Session = Depen
          raise HTTPException(status_code=400, detail="API Key is required (or valid Provider ID)")
 
     # Generate a temporary secret for the webhook URL
-    import uuid
     temp_secret = uuid.uuid4().hex
     
     # Check if we should reuse an existing secret
@@ -1694,7 +1990,6 @@ def create_provider_app(request: CreateAppRequest, session: Session = Depends(ge
          raise HTTPException(status_code=400, detail="API Key is required (or valid Provider ID)")
 
     # Generate a temporary secret for the webhook URL
-    import uuid
     temp_secret = uuid.uuid4().hex
 
     # Check if we should reuse an existing secret
@@ -1721,25 +2016,15 @@ def create_provider_app(request: CreateAppRequest, session: Session = Depends(ge
         "message": "App created. Please save the provider to persist the App ID and Webhook Secret."
     }
 
-def generate_silence(duration_sec=1.0, codec="PCMU"):
-   """Generate silent audio chunks."""
+@lru_cache(maxsize=None)
+def silence_payload(duration_sec: float, codec: str = "PCMU") -> str:
+   """Base64 payload holding `duration_sec` of silence as a single frame. Cached per (duration, codec)."""
    if codec == "L16":
-       sample_rate = 8000 # 16000 << Telnyx PSTN L16 is 8kHz
        bytes_per_sample = 2
        silence_byte = 0x00
    else: # PCMU / PCMA
-       sample_rate = 8000
        bytes_per_sample = 1
-       silence_byte = 0xFF if codec == "PCMU" else 0xD5 # PCMA silence is typically 0xD5 or 0x55, but 0xFF is often acceptable quiet. PCMU is 0xFF.
-
-   # 20ms chunk size
-   # PCMU: 8000 * 0.02 * 1 = 160 bytes
-   # L16: 16000 * 0.02 * 2 = 640 bytes
-   CHUNK_SIZE = int(sample_rate * 0.02 * bytes_per_sample)
-   
-   total_bytes = int(duration_sec * sample_rate * bytes_per_sample)
-   silence = bytes([silence_byte] * CHUNK_SIZE)
-   
-   num_chunks = total_bytes // CHUNK_SIZE
-   for _ in range(num_chunks):
-       yield base64.b64encode(silence).decode('utf-8')
+       silence_byte = 0xFF if codec == "PCMU" else 0xD5 # PCMA silence is typically 0xD5 or 0x55. PCMU is 0xFF.
+
+   total_bytes = int(duration_sec * 8000 * bytes_per_sample)
+   return b64encode_str(bytes([silence_byte]) * total_bytes)
@@ -0,0 +1,269 @@
+import math
+import binascii
+import struct
+import audioop
+from collections import deque
+from typing import Optional
+import numpy as np
+
+try:
+    import pybase64
+except ImportError: # Optional SIMD base64 codec; falls back to the stdlib
+    pybase64 = None
+
+# RIFF/WAVE header layout (44 bytes), compiled once
+WAV_HEADER_STRUCT = struct.Struct('<4sI4s4sIHHIIHH4sI')
+
+# G.711 decode tables. Every 8-bit code maps to exactly one PCM16 sample, so decoding a
+# payload is a single vectorized gather instead of a per-byte audioop call.
+# Built from audioop itself so the output is bit-identical (native byte order, like audioop).
+ULAW_TO_PCM16 = np.frombuffer(audioop.ulaw2lin(bytes(range(256)), 2), dtype=np.int16).copy()
+ALAW_TO_PCM16 = np.frombuffer(audioop.alaw2lin(bytes(range(256)), 2), dtype=np.int16).copy()
+
+# G.711 encode tables, indexed by the int16 sample reinterpreted as uint16 (one gather per sample).
+_ALL_PCM16 = np.arange(65536, dtype=np.uint16).view(np.int16).tobytes()
+PCM16_TO_ULAW = np.frombuffer(audioop.lin2ulaw(_ALL_PCM16, 2), dtype=np.uint8).copy()
+PCM16_TO_ALAW = np.frombuffer(audioop.lin2alaw(_ALL_PCM16, 2), dtype=np.uint8).copy()
+del _ALL_PCM16
+
+def samples_to_ulaw(samples: np.ndarray) -> bytes:
+    """Encodes an int16 sample array to u-law (PCMU) bytes."""
+    return PCM16_TO_ULAW[samples.view(np.uint16)].tobytes()
+
+def samples_to_alaw(samples: np.ndarray) -> bytes:
+    """Encodes an int16 sample array to a-law (PCMA) bytes."""
+    return PCM16_TO_ALAW[samples.view(np.uint16)].tobytes()
+
+def ulaw_to_samples(data: bytes) -> np.ndarray:
+    """Decodes u-law (PCMU) bytes to an int16 sample array."""
+    return ULAW_TO_PCM16[np.frombuffer(data, dtype=np.uint8)]
+
+def alaw_to_samples(data: bytes) -> np.ndarray:
+    """Decodes a-law (PCMA) bytes to an int16 sample array."""
+    return ALAW_TO_PCM16[np.frombuffer(data, dtype=np.uint8)]
+
+def pcm16_samples(data: bytes) -> np.ndarray:
+    """Zero-copy int16 view of 16-bit linear PCM (L16) bytes."""
+    return np.frombuffer(data, dtype=np.int16)
+
+def ulaw_to_pcm16(data: bytes) -> bytes:
+    """Decodes u-law (PCMU) bytes to 16-bit linear PCM."""
+    return ulaw_to_samples(data).tobytes()
+
+def alaw_to_pcm16(data: bytes) -> bytes:
+    """Decodes a-law (PCMA) bytes to 16-bit linear PCM."""
+    return alaw_to_samples(data).tobytes()
+
+# Media payloads are base64 in both directions, once per frame.
+if pybase64:
+    def b64encode_str(data: bytes) -> str:
+        """Base64-encodes `data` straight to a str (no intermediate bytes object)."""
+        return pybase64.b64encode_as_string(data)
+
+    def b64decode(payload) -> bytes:
+        """Decodes a base64 media payload. Telnyx payloads are trusted, so validation is skipped."""
+        return pybase64.b64decode(payload, validate=False)
+else:
+    # binascii directly: base64.b64encode/b64decode are Python wrappers around these same C calls
+    def b64encode_str(data: bytes) -> str:
+        """Base64-encodes `data` to a str."""
+        return binascii.b2a_base64(data, newline=False).decode('ascii')
+
+    def b64decode(payload) -> bytes:
+        """Decodes a base64 media payload."""
+        return binascii.a2b_base64(payload)
+
+def b64_decoded_len(payload: str) -> int:
+    """Number of bytes a padded base64 payload decodes to, from its length alone (no decode)."""
+    n = len(payload)
+    if n == 0:
+        return 0
+    return n // 4 * 3 - (payload[-1] == "=") - (payload[-2] == "=")
+
+def _decode_l16(data: bytes):
+    # Telnyx PSTN sends 8k little-endian L16: no swap, no resample
+    return pcm16_samples(data), data
+
+def _decode_pcma(data: bytes):
+    samples = alaw_to_samples(data)
+    return samples, samples.tobytes()
+
+def _decode_pcmu(data: bytes):
+    samples = ulaw_to_samples(data)
+    return samples, samples.tobytes()
+
+INBOUND_DECODERS = {"L16": _decode_l16, "PCMA": _decode_pcma, "PCMU": _decode_pcmu}
+
+def get_decoder(codec: str):
+    """
+    Returns the inbound decoder for `codec`: payload bytes -> (int16 samples, PCM16 bytes).
+    Resolved once per call so the media loop doesn't branch on the codec per packet. Unknown codecs decode as PCMU.
+    """
+    return INBOUND_DECODERS.get(codec, _decode_pcmu)
+
+def lowpass_fir(factor: int, taps_per_phase: int = 32) -> np.ndarray:
+    """
+    Windowed-sinc (Hamming) anti-aliasing filter for decimating by `factor`, normalized to unity DC gain.
+    Cutoff sits at 85% of the output Nyquist (3.4kHz when decimating to 8kHz), the telephone band edge.
+    """
+    num_taps = taps_per_phase * factor + 1
+    cutoff = 0.85 / factor # as a fraction of the input Nyquist
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = cutoff * np.sinc(cutoff * n) * np.hamming(num_taps)
+    return (taps / taps.sum()).astype(np.float32)
+
+class FIRDecimator:
+    """
+    Streaming integer-ratio resampler (e.g. 24kHz TTS -> 8kHz) for int16 audio.
+    Polyphase in effect: the FIR is evaluated only at the kept output positions, as one matrix-vector product.
+    Filter history and decimation phase are carried between calls, like audioop.ratecv's state tuple.
+    """
+    def __init__(self, factor: int):
+        self.factor = factor
+        self.taps = lowpass_fir(factor)[::-1].copy()
+        self.history = np.zeros(len(self.taps) - 1, dtype=np.float32)
+        self.phase = 0 # offset of the next kept sample in the next block
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Filters and decimates a block of int16 samples, returning int16 samples at the output rate."""
+        x = np.concatenate((self.history, samples.astype(np.float32)))
+        windows = np.lib.stride_tricks.sliding_window_view(x, len(self.taps))[self.phase::self.factor]
+        out = np.ascontiguousarray(windows) @ self.taps # contiguous rows let BLAS run the product
+        self.phase = (self.phase - len(samples)) % self.factor
+        self.history = x[len(x) - len(self.history):]
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+def rms(samples: np.ndarray) -> int:
+    """
+    Root-mean-square energy of an int16 sample array.
+    Same result as audioop.rms(data, 2), computed on the already decoded samples.
+    """
+    if len(samples) == 0:
+        return 0
+    as_float = samples.astype(np.float64)
+    return int(math.sqrt(np.dot(as_float, as_float) / len(samples)))
+
+class PCMBuffer:
+    """
+    Inbound PCM16 audio collected between two STT flushes.
+    Audio is written into one bytearray that is allocated once per call, right after room for the
+    WAV header, so clear() just rewinds and the WAV handed to STT needs a single copy.
+    """
+    def __init__(self, capacity: int = 16000 * 15):
+        self.buf = bytearray(WAV_HEADER_STRUCT.size + capacity)
+        self.nbytes = 0
+
+    def append(self, chunk: bytes):
+        start = WAV_HEADER_STRUCT.size + self.nbytes
+        end = start + len(chunk)
+        if end > len(self.buf): # past capacity (the failsafe flush happens on the next packet): grow
+            self.buf.extend(bytes(end - len(self.buf)))
+        self.buf[start:end] = chunk
+        self.nbytes += len(chunk)
+
+    def clear(self):
+        self.nbytes = 0
+
+    def __len__(self):
+        return self.nbytes
+
+    def to_wav(self, sample_rate: int = 8000, start: int = 0, end: Optional[int] = None) -> bytes:
+        """
+        Returns a mono 16-bit WAV file (header + audio bytes [start:end]). For a slice starting at 0 the
+        header is packed in place in front of the audio, so either way the audio is copied once.
+        The result is immutable bytes, which multipart uploads (httpx / requests) need.
+        """
+        end = self.nbytes if end is None else end
+        header_size = WAV_HEADER_STRUCT.size
+        fields = (
+            b'RIFF', 36 + end - start, b'WAVE',
+            b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+            b'data', end - start
+        )
+        with memoryview(self.buf) as view:
+            if start == 0:
+                WAV_HEADER_STRUCT.pack_into(self.buf, 0, *fields)
+                return bytes(view[:header_size + end])
+            return WAV_HEADER_STRUCT.pack(*fields) + view[header_size + start:header_size + end]
+
+    def quietest_split(self, lo: int, hi: int) -> int:
+        """
+        Byte offset (middle of the quietest 20ms frame between audio offsets lo and hi) at which the
+        audio can be cut with the least chance of splitting a word.
+        """
+        lo -= lo % VAD_FRAME_BYTES
+        hi = min(hi, self.nbytes)
+        samples = np.frombuffer(self.buf, dtype=np.int16, count=(hi - lo) // 2, offset=WAV_HEADER_STRUCT.size + lo)
+        quietest = int(np.argmin(frame_mean_squares(samples)))
+        del samples # release the buffer export so append() can still grow the bytearray
+        return lo + quietest * VAD_FRAME_BYTES + VAD_FRAME_BYTES // 2
+
+# --- Voice Activity Detection ---
+try:
+    import webrtcvad
+except ImportError: # Optional C extension; falls back to the RMS energy gate
+    webrtcvad = None
+
+VAD_FRAME_BYTES = 320 # 20ms of 8kHz PCM16 (webrtcvad accepts 10/20/30ms frames)
+VAD_FRAME_SAMPLES = VAD_FRAME_BYTES // 2
+ENERGY_THRESHOLD = 500 # RMS below this always counts as silence for the energy-only VAD
+NOISE_FLOOR_RATIO = 3.0 # Energy gate: speech must be this many times louder than the line's noise floor
+NOISE_FLOOR_FRAMES = 100 # Energy gate: the noise floor is the quietest 20ms frame of the last 2s
+
+def frame_mean_squares(samples: np.ndarray) -> np.ndarray:
+    """
+    Mean square (RMS squared) of every 20ms frame of an int16 sample array, in one vectorized pass.
+    Packets shorter than two frames are measured as a whole; a partial trailing frame is ignored.
+    """
+    frames = len(samples) // VAD_FRAME_SAMPLES
+    if frames < 2:
+        if len(samples) == 0:
+            return np.zeros(1)
+        as_float = samples.astype(np.float64)
+        return np.array([np.dot(as_float, as_float) / len(samples)])
+    x = samples[:frames * VAD_FRAME_SAMPLES].astype(np.float64).reshape(frames, VAD_FRAME_SAMPLES)
+    return np.einsum('ij,ij->i', x, x) / VAD_FRAME_SAMPLES
+
+class EnergyVAD:
+    """
+    RMS energy gate with an adaptive threshold, used when webrtcvad is not installed.
+    The line's noise floor is the lowest per-frame RMS over the last NOISE_FLOOR_FRAMES frames (even
+    continuous speech has quiet frames, the line noise never goes away). A frame is speech when it is
+    louder than both ENERGY_THRESHOLD and NOISE_FLOOR_RATIO x the floor, so hiss on a noisy PSTN leg
+    doesn't keep the utterance open (or get sent to STT). Stateful: one per call.
+    """
+    __slots__ = ("recent_rms",)
+
+    def __init__(self):
+        self.recent_rms = deque(maxlen=NOISE_FLOOR_FRAMES)
+
+    @property
+    def noise_floor(self) -> float:
+        return min(self.recent_rms) if self.recent_rms else 0.0
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        frame_rms = np.sqrt(frame_mean_squares(samples))
+        threshold = max(ENERGY_THRESHOLD, self.noise_floor * NOISE_FLOOR_RATIO) # from the frames before this packet
+        self.recent_rms.extend(frame_rms.tolist())
+        return bool(np.any(frame_rms >= threshold))
+
+def create_vad(aggressiveness: int = 2):
+    """Returns a WebRTC VAD instance, or an EnergyVAD when webrtcvad is not installed."""
+    return webrtcvad.Vad(aggressiveness) if webrtcvad else EnergyVAD()
+
+def is_speech(vad, pcm16: bytes, samples: np.ndarray) -> bool:
+    """
+    Speech decision for one inbound packet of 8kHz PCM16 (`samples` is the same audio as an int16 array).
+    Uses WebRTC VAD on 20ms frames when available, otherwise the adaptive EnergyVAD.
+    Packets too short for WebRTC VAD (and vad=None) use the fixed RMS gate.
+    The RMS is only computed on the energy paths.
+    """
+    if isinstance(vad, EnergyVAD):
+        return vad.is_speech(samples)
+    if vad is None or len(pcm16) < VAD_FRAME_BYTES:
+        # Speech if any 20ms frame is loud, like the VAD path
+        return bool(np.any(frame_mean_squares(samples) >= ENERGY_THRESHOLD * ENERGY_THRESHOLD))
+    for offset in range(0, len(pcm16) - VAD_FRAME_BYTES + 1, VAD_FRAME_BYTES):
+        if vad.is_speech(pcm16[offset:offset + VAD_FRAME_BYTES], 8000):
+            return True
+    return False
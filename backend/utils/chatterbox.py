@@ -1,6 +1,9 @@
 import httpx
 import typing
 
+# Shared async client: one per process, so each sentence reuses a pooled connection instead of a fresh client + TCP handshake
+HTTP_CLIENT = httpx.AsyncClient(http2=True, limits=httpx.Limits(max_keepalive_connections=64, keepalive_expiry=60))
+
 class ChatterboxClient:
     def __init__(self, base_url: str):
         self.base_url = base_url.rstrip('/')
@@ -18,11 +21,10 @@ class ChatterboxClient:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                async with client.stream("POST", url, json=payload) as resp:
-                    resp.raise_for_status()
-                    async for chunk in resp.aiter_bytes(chunk_size=4096):
-                        yield chunk
+            async with HTTP_CLIENT.stream("POST", url, json=payload, timeout=timeout) as resp:
+                resp.raise_for_status()
+                async for chunk in resp.aiter_bytes(chunk_size=4096):
+                    yield chunk
         except Exception as e:
             print(f"[Chatterbox] Error streaming speech: {e}")
             raise e
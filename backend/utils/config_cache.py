@@ -0,0 +1,126 @@
+import time
+from typing import Optional
+from sqlmodel import Session, select
+
+from ..database import engine
+from ..models import VoiceConfig, ProviderConfig, VOICE_CONFIG_ID
+from .security import decrypt_value
+
+# In-process cache of the decoded VoiceConfig.
+# Stored as (fetched_at, data) so decrypt_value() runs at most once per TTL instead of once per call.
+_VCFG_CACHE: Optional[tuple] = None
+_VCFG_TTL = 10.0
+
+# Decrypted provider API keys by provider name: name -> (fetched_at, api_key)
+_PROVIDER_KEY_CACHE: dict = {}
+_PROVIDER_KEY_TTL = 60.0
+
+# Webhook token -> (fetched_at, detached ProviderConfig). Only hits are cached, so bogus tokens can't grow it.
+_WEBHOOK_PROVIDER_CACHE: dict = {}
+_WEBHOOK_PROVIDER_TTL = 30.0
+
+def get_voice_config_row(session: Session) -> Optional[VoiceConfig]:
+    """
+    Returns the singleton VoiceConfig row via a primary-key lookup (identity map first, then a PK SELECT).
+    Falls back to the first row for databases seeded before VOICE_CONFIG_ID was pinned.
+    """
+    return session.get(VoiceConfig, VOICE_CONFIG_ID) or session.exec(select(VoiceConfig)).first()
+
+# Values used when there is no VoiceConfig row (or a field is unset)
+VOICE_CONFIG_DEFAULTS = {
+    "llm_url": "http://open-webui:8080/v1",
+    "llm_api_key": None,
+    "llm_model": "gpt-3.5-turbo",
+    "voice_id": "default",
+    "system_prompt": None,
+    "stt_url": "http://parakeet:8000",
+    "tts_url": "http://chatterbox:8000",
+    "stt_timeout": 10,
+    "tts_timeout": 10,
+    "llm_timeout": 10,
+    "send_context": True,
+    "rtp_codec": "PCMU",
+}
+
+def _load_voice_config() -> dict:
+    with Session(engine) as session:
+        voice_config = get_voice_config_row(session)
+
+    if not voice_config:
+        return dict(VOICE_CONFIG_DEFAULTS)
+
+    return {
+        "llm_url": voice_config.llm_url or VOICE_CONFIG_DEFAULTS["llm_url"],
+        "llm_api_key": decrypt_value(voice_config.llm_api_key) if voice_config.llm_api_key else None,
+        "llm_model": voice_config.llm_model or VOICE_CONFIG_DEFAULTS["llm_model"],
+        "voice_id": voice_config.voice_id or VOICE_CONFIG_DEFAULTS["voice_id"],
+        "system_prompt": voice_config.system_prompt,
+        "stt_url": voice_config.stt_url or VOICE_CONFIG_DEFAULTS["stt_url"],
+        "tts_url": voice_config.tts_url or VOICE_CONFIG_DEFAULTS["tts_url"],
+        "stt_timeout": voice_config.stt_timeout or VOICE_CONFIG_DEFAULTS["stt_timeout"],
+        "tts_timeout": voice_config.tts_timeout or VOICE_CONFIG_DEFAULTS["tts_timeout"],
+        "llm_timeout": voice_config.llm_timeout or VOICE_CONFIG_DEFAULTS["llm_timeout"],
+        "send_context": voice_config.send_conversation_context,
+        "rtp_codec": voice_config.rtp_codec or VOICE_CONFIG_DEFAULTS["rtp_codec"],
+    }
+
+def get_voice_config_cached() -> dict:
+    """
+    Returns the decoded VoiceConfig as a dict, refreshing it from the DB at most every _VCFG_TTL seconds.
+    """
+    global _VCFG_CACHE
+    now = time.monotonic()
+    if _VCFG_CACHE and now - _VCFG_CACHE[0] < _VCFG_TTL:
+        return _VCFG_CACHE[1]
+
+    data = _load_voice_config()
+    _VCFG_CACHE = (now, data)
+    return data
+
+def invalidate_voice_config():
+    """
+    Drops the cached VoiceConfig. Call after the config is changed via the API.
+    """
+    global _VCFG_CACHE
+    _VCFG_CACHE = None
+
+def get_provider_api_key_cached(name: str) -> Optional[str]:
+    """
+    Returns the decrypted API key of the named provider (None if not configured), cached for _PROVIDER_KEY_TTL seconds.
+    """
+    now = time.monotonic()
+    cached = _PROVIDER_KEY_CACHE.get(name)
+    if cached and now - cached[0] < _PROVIDER_KEY_TTL:
+        return cached[1]
+
+    with Session(engine) as session:
+        provider_config = session.exec(select(ProviderConfig).where(ProviderConfig.name == name)).first()
+    api_key = decrypt_value(provider_config.api_key) if provider_config and provider_config.api_key else None
+    _PROVIDER_KEY_CACHE[name] = (now, api_key)
+    return api_key
+
+def get_provider_by_webhook_token(token: str) -> Optional[ProviderConfig]:
+    """
+    Returns the ProviderConfig whose webhook_secret matches `token` (None if no match).
+    Telnyx sends several webhooks per call, so hits are cached for _WEBHOOK_PROVIDER_TTL seconds.
+    The returned row is detached: read it, don't modify it.
+    """
+    now = time.monotonic()
+    cached = _WEBHOOK_PROVIDER_CACHE.get(token)
+    if cached and now - cached[0] < _WEBHOOK_PROVIDER_TTL:
+        return cached[1]
+
+    with Session(engine) as session:
+        provider = session.exec(select(ProviderConfig).where(ProviderConfig.webhook_secret == token)).first()
+    if provider:
+        _WEBHOOK_PROVIDER_CACHE[token] = (now, provider)
+    else:
+        _WEBHOOK_PROVIDER_CACHE.pop(token, None)
+    return provider
+
+def invalidate_provider_config():
+    """
+    Drops all cached provider data. Call after a provider is created, updated, deleted or re-synced.
+    """
+    _PROVIDER_KEY_CACHE.clear()
+    _WEBHOOK_PROVIDER_CACHE.clear()
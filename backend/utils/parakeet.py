@@ -1,6 +1,10 @@
 import requests
+import httpx
 import typing
 
+# Shared async client so STT requests reuse pooled keep-alive connections instead of reconnecting per utterance
+HTTP_CLIENT = httpx.AsyncClient(http2=True, limits=httpx.Limits(max_keepalive_connections=64, keepalive_expiry=60))
+
 class ParakeetClient:
     def __init__(self, base_url: str):
         self.base_url = base_url.rstrip('/')
@@ -23,6 +27,23 @@ class ParakeetClient:
             print(f"[Parakeet] Error transcribing: {e}")
             raise e
 
+    async def transcribe_async(self, audio_data: bytes, filename: str = "audio.wav", timeout: int = 10) -> str:
+        """
+        Async version of transcribe() for use inside the event loop (e.g. the voice WebSocket).
+        """
+        url = f"{self.base_url}/transcribe"
+        files = {
+            'file': (filename, audio_data, 'audio/wav')
+        }
+        try:
+            resp = await HTTP_CLIENT.post(url, files=files, timeout=timeout)
+            resp.raise_for_status()
+            data = resp.json()
+            return data.get("text", "")
+        except Exception as e:
+            print(f"[Parakeet] Error transcribing: {e}")
+            raise e
+
     def health(self) -> bool:
         try:
             resp = requests.get(f"{self.base_url}/healthz", timeout=2)
@@ -1,15 +1,23 @@
 import os
 import base64
+from functools import lru_cache
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
-def _get_fernet():
+def _get_salt() -> str:
     salt = os.getenv("SALT", "default_insecure_salt_change_me")
     if salt == "replace_with_long_random_string":
         # Fallback if user didn't change sample
         salt = "fallback_salt_value"
-        
+    return salt
+
+def _get_fernet():
+    return _fernet_for_salt(_get_salt())
+
+@lru_cache(maxsize=4)
+def _fernet_for_salt(salt: str) -> Fernet:
+    # PBKDF2 (100k iterations) is by far the most expensive step, so the derived key is built once per salt.
     password = b"db_encryption_key" # In a real app, this should be a separate secret too. 
     # For now, we derive the key from the SALT alone effectively, assuming SALT is the secret.
     
@@ -43,8 +51,13 @@ def decrypt_value(value: str) -> str:
     if os.getenv("ENCRYPTION_ENABLED", "false").lower() != "true":
         return value
 
+    return _decrypt_cached(value, _get_salt())
+
+@lru_cache(maxsize=256)
+def _decrypt_cached(value: str, salt: str) -> str:
+    # Ciphertexts are immutable, so a rotated secret is simply a new cache key.
     try:
-        f = _get_fernet()
+        f = _fernet_for_salt(salt)
         return f.decrypt(value.encode()).decode()
     except Exception as e:
         # If decryption fails (e.g. invalid token, or not encrypted yet), return original